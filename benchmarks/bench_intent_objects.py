@@ -0,0 +1,160 @@
+"""
+Copyright (c) 2021 Philipp Scheer
+
+Compare the per-utterance time and memory of the slotted intent objects
+against plain `__dict__` based classes with the same behaviour.
+
+    python benchmarks/bench_intent_objects.py [utterances]
+"""
+
+
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from jarvis_sdk import Entity, IEntity, IntentResponse, IntentTextResponse, CapturedIntentData
+
+
+NLU_RESULT = {
+    "input": "How's the weather in New York tomorrow?",
+    "skill": "Weather",
+    "intent": "getWeather",
+    "probability": 0.963054744983951,
+    "slots": [
+        {
+            "range": {"start": 21, "end": 29},
+            "rawValue": "New York",
+            "value": {"kind": "Custom", "value": "New York"},
+            "entity": "bench_city",
+            "slotName": "city_name"
+        },
+        {
+            "range": {"start": 30, "end": 38},
+            "rawValue": "tomorrow",
+            "value": {"kind": "Custom", "value": "tomorrow"},
+            "entity": "unknown",
+            "slotName": "time"
+        }
+    ]
+}
+
+
+class bench_city(IEntity):
+    __slots__ = ()
+
+    def resolve(self):
+        return self.data["rawValue"].upper()
+
+Entity.register(bench_city)
+
+
+class dict_city():
+    def __init__(self) -> None:
+        self.data = {}
+
+    def _set_slot_data(self, slot_data):
+        self.data = slot_data
+
+    def resolve(self):
+        return self.data["rawValue"].upper()
+
+DICT_ENTITIES = {"bench_city": dict_city}
+
+class DictTextResponse():
+    def __init__(self, responses) -> None:
+        self.responses = responses
+
+class DictResponse():
+    def __init__(self, text=None, speech=None, card=None) -> None:
+        assert text is None or isinstance(text, DictTextResponse)
+        self.text = text
+        self.speech = speech
+        self.card = card
+
+    def pick_results(self, function):
+        return DictResolvedResponse(text=function(self.text) if isinstance(self.text, DictTextResponse) else None,
+                                    speech=None, card=self.card)
+
+class DictResolvedResponse():
+    def __init__(self, text=None, speech=None, card=None) -> None:
+        assert text is None or isinstance(text, str)
+        assert speech is None or isinstance(speech, str)
+        self.text = text
+        self.speech = speech
+        self.card = card
+
+class DictSlotsContainer():
+    def __init__(self, slots) -> None:
+        self._slots = slots
+
+    def __getattr__(self, key):
+        try:
+            for slot in self._slots:
+                if slot.get("slotName", None) == key:
+                    if slot.get("resolved", None) is not None:
+                        return slot.get("resolved", None)
+                    AnyEntity = DICT_ENTITIES.get(slot.get("entity", None), None)
+                    if AnyEntity is None:
+                        return slot.get("value", {}).get("value", None)
+                    entity = AnyEntity()
+                    entity._set_slot_data(slot)
+                    return entity.resolve()
+            return None
+        except Exception:
+            return None
+
+class DictCapturedIntentData():
+    def __init__(self, data) -> None:
+        self.data = data
+        assert isinstance(self.data, dict)
+        for k in ["input", "skill", "intent", "probability", "slots"]:
+            assert k in self.data
+
+    @property
+    def slots(self):
+        return DictSlotsContainer(self.data.get("slots", []))
+
+
+# both variants run the same steps as `Intent._emit` and a typical handler
+def utterance_dict():
+    data = DictCapturedIntentData(NLU_RESULT)
+    city = data.slots.city_name
+    when = data.slots.time
+    response = DictResponse(text=DictTextResponse([f"Sunny in {city} {when}"]))
+    return data, response.pick_results(lambda r: r.responses[0])
+
+def utterance_slotted():
+    data = CapturedIntentData._trusted(NLU_RESULT)
+    city = data.slots.city_name
+    when = data.slots.time
+    response = IntentResponse.single_text(f"Sunny in {city} {when}")
+    return data, response.pick_results(lambda r: r.responses[0])
+
+
+def measure(func, n: int):
+    func()
+    start = time.perf_counter()
+    for _ in range(n):
+        func()
+    took = time.perf_counter() - start
+
+    keep = []
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for _ in range(1000):
+        keep.append(func())
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    retained = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    return took / n * 1e6, retained / 1000
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    print(f"{'variant':<10} {'us/utterance':>14} {'bytes/utterance':>16}")
+    for name, func in (("dict", utterance_dict), ("slotted", utterance_slotted)):
+        us, retained = measure(func, n)
+        print(f"{name:<10} {us:>14.2f} {retained:>16.0f}")
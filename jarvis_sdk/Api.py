@@ -4,6 +4,7 @@ Copyright (c) 2021 Philipp Scheer
 
 
 import requests
+from .Metrics import Metrics
 
 
 class Api():
@@ -12,12 +13,16 @@ class Api():
     @staticmethod
     def endpoint(endpoint, post_data={}):
         """Call an endpoint of the official Jarvis API"""
+        Metrics.inc("api_calls_total", endpoint=endpoint)
         try:
-            result = Api.post(f"{Api.BASE_URL}{endpoint}", post_data=post_data)
+            with Metrics.timer("api_call_seconds", endpoint=endpoint):
+                result = Api.post(f"{Api.BASE_URL}{endpoint}", post_data=post_data)
         except requests.exceptions.ConnectionError:
+            Metrics.inc("api_errors_total", endpoint=endpoint, error="API_UNREACHABLE")
             return ApiErrorResponse({}, "API_UNREACHABLE")
         if result.get("success", None):
             return result["result"]
+        Metrics.inc("api_errors_total", endpoint=endpoint, error="API_ERROR")
         return ApiErrorResponse(result)
 
     @staticmethod
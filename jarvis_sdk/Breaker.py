@@ -0,0 +1,190 @@
+"""
+Copyright (c) 2021 Philipp Scheer
+"""
+
+
+import time
+import threading
+import traceback
+from collections import deque
+from .Metrics import Metrics
+
+
+class HandlerTimeoutError(Exception):
+    """Raised if an intent handler exceeds its deadline"""
+    pass
+
+
+class CircuitBreaker():
+    """Temporarily skip a handler which fails or times out too often.
+    The breaker keeps the outcome of the last `window` calls. If at least `min_calls` were recorded and
+    the failure rate reaches `failure_rate`, the breaker opens and the handler is skipped for `cooldown` seconds.
+    After that a single trial call is let through (half open), its outcome closes or reopens the breaker.
+    Usage:
+    ```python
+    from jarvis_sdk import Intent, IntentResponse, CircuitBreaker
+
+    @Intent.on("Weather", "getWeather", timeout=2, breaker=CircuitBreaker(failure_rate=0.5, cooldown=30),
+               fallback=IntentResponse.single_text("The weather service is unavailable right now"))
+    def Weather_getWeather(captured_data):
+        ...
+    ```"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_rate: float = 0.5, min_calls: int = 5, window: int = 20, cooldown: float = 30) -> None:
+        assert 0 < failure_rate <= 1, "failure_rate has to be in (0, 1]"
+        assert 0 < min_calls <= window, "min_calls has to be in (0, window]"
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.cooldown = cooldown
+        self.name = None
+        self._outcomes = deque(maxlen=window)
+        self._state = CircuitBreaker.CLOSED
+        self._opened_at = 0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """Get the current state, one of `closed`, `open` or `half_open`"""
+        with self._lock:
+            self._check_cooldown()
+            return self._state
+
+    def allow(self) -> bool:
+        """Check if a call may pass, reserves the trial call if the breaker is half open"""
+        with self._lock:
+            self._check_cooldown()
+            if self._state == CircuitBreaker.CLOSED:
+                return True
+            if self._state == CircuitBreaker.HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record(self, success: bool):
+        """Record the outcome of a call which was allowed by `.allow()`"""
+        with self._lock:
+            if self._state == CircuitBreaker.HALF_OPEN:
+                self._trial_running = False
+                if success:
+                    self._outcomes.clear()
+                    self._set_state(CircuitBreaker.CLOSED)
+                else:
+                    self._open()
+                return
+            self._outcomes.append(success)
+            if len(self._outcomes) >= self.min_calls:
+                failures = self._outcomes.count(False)
+                if failures / len(self._outcomes) >= self.failure_rate:
+                    self._open()
+
+    def reset(self):
+        """Close the breaker and forget all recorded outcomes"""
+        with self._lock:
+            self._outcomes.clear()
+            self._trial_running = False
+            self._set_state(CircuitBreaker.CLOSED)
+
+    def json(self):
+        with self._lock:
+            self._check_cooldown()
+            return {
+                "state": self._state,
+                "calls": len(self._outcomes),
+                "failures": self._outcomes.count(False),
+                "opened_at": self._opened_at if self._state != CircuitBreaker.CLOSED else None
+            }
+
+    def _open(self):
+        self._opened_at = time.time()
+        self._set_state(CircuitBreaker.OPEN)
+
+    def _check_cooldown(self):
+        if self._state == CircuitBreaker.OPEN and time.time() - self._opened_at >= self.cooldown:
+            self._set_state(CircuitBreaker.HALF_OPEN)
+
+    def _set_state(self, state: str):
+        self._state = state
+        if self.name is not None:
+            Metrics.set("intent_handler_breaker_open", 0 if state == CircuitBreaker.CLOSED else 1, handler=self.name)
+
+
+class HandlerGuard():
+    """Internal class which enforces the deadline, concurrency limit and breaker of a single handler.
+    Skipped calls (open breaker, concurrency limit reached) return the `fallback` without running the handler,
+    failed and timed out calls return the `fallback` if given, else raise.
+    You should not call this class, use the arguments of `Intent.on` instead"""
+
+    def __init__(self, func, name: str, timeout: float = None, max_concurrency: int = None, breaker: CircuitBreaker = None, fallback = None) -> None:
+        self.func = func
+        self.name = name
+        self.timeout = timeout
+        self.breaker = breaker
+        self.fallback = fallback
+        self._slots = threading.BoundedSemaphore(max_concurrency) if max_concurrency else None
+        if self.breaker is not None:
+            self.breaker.name = name
+
+    def __call__(self, *args, **kwargs):
+        if self._slots is not None and not self._slots.acquire(blocking=False):
+            Metrics.inc("intent_handler_rejected_total", handler=self.name, reason="concurrency")
+            return self.fallback
+        if self.breaker is not None and not self.breaker.allow():
+            if self._slots is not None:
+                self._slots.release()
+            Metrics.inc("intent_handler_rejected_total", handler=self.name, reason="breaker")
+            return self.fallback
+        if self.timeout is None:
+            try:
+                res = self.func(*args, **kwargs)
+            except Exception as e:
+                return self._fail(e)
+            finally:
+                if self._slots is not None:
+                    self._slots.release()
+            self._record(True)
+            return res
+        return self._call_with_deadline(args, kwargs)
+
+    def _call_with_deadline(self, args, kwargs):
+        outcome = {}
+        done = threading.Event()
+        def _run():
+            try:
+                outcome["result"] = self.func(*args, **kwargs)
+            except Exception as e:
+                outcome["error"] = e
+            finally:
+                # the slot is only released once the handler really returned,
+                # so hung handlers keep counting towards the concurrency limit
+                if self._slots is not None:
+                    self._slots.release()
+                done.set()
+        t = threading.Thread(target=_run, name=f"jarvis-handler-{self.name}")
+        t.daemon = True
+        t.start()
+        if not done.wait(self.timeout):
+            Metrics.inc("intent_handler_timeouts_total", handler=self.name)
+            return self._fail(HandlerTimeoutError(f"{self.name} exceeded its deadline of {self.timeout}s"))
+        if "error" in outcome:
+            return self._fail(outcome["error"])
+        self._record(True)
+        return outcome.get("result", None)
+
+    def _record(self, success: bool):
+        if self.breaker is not None:
+            self.breaker.record(success)
+
+    def _fail(self, error: Exception):
+        self._record(False)
+        if self.fallback is not None:
+            # `_emit` only sees the fallback, so the error is reported here
+            Metrics.inc("intent_handler_errors_total", handler=self.name)
+            print(f"Exception occured in endpoint {self.name}, returning fallback")
+            traceback.print_exception(type(error), error, error.__traceback__)
+            return self.fallback
+        raise error
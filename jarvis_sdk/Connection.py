@@ -4,16 +4,24 @@ Copyright (c) 2021 Philipp Scheer
 
 
 import json
+import time
 import random
 import traceback
 import threading
 import websocket
+from .Metrics import Metrics
+from .Intent import Intent
+from .Scheduler import InboundScheduler
 
 
 class Connection:
     _requests = {}
+    _in_flight = {}
 
-    def __init__(self, device_id: str, host: str = "jarvis.fipsi.at", port: int = 5522, debug: bool = False) -> None:
+    def __init__(self, device_id: str, host: str = "jarvis.fipsi.at", port: int = 5522, debug: bool = False, scheduler: InboundScheduler = None) -> None:
+        """Connect to the Jarvis server as `device_id`.  
+        Inbound messages are dispatched by priority through an `InboundScheduler` (a default one if `scheduler` is `None`),
+        pass `scheduler=False` to handle them on the websocket thread in arrival order"""
         self.id = device_id
         self._h = host
         self._p = port
@@ -25,28 +33,63 @@ class Connection:
         self.on_close = None
         self.debug = debug
         self.loop = None
+        self._scheduler = InboundScheduler() if scheduler is None else scheduler
+        if self._scheduler:
+            self._scheduler.start(self._dispatch)
         self._run()
 
-    def request(self, endpoint: str, payload: dict = {}, callback = None) -> None:
+    def request(self, endpoint: str, payload: dict = {}, callback = None) -> str:
+        """Send a request to `endpoint`, `callback` is called with every reply.  
+        Returns the request id or `None` if the connection is not open"""
         if self._can_send and self._ws is not None:
-            id = ''.join(random.choice("abcdef0123456789") for i in range(64))
-            data = json.dumps({
-                **payload,
-                "$endpoint": endpoint,
-                "$devid": self.id,
-                "$reqid": id
-            })
-            if self.debug:
-                print(">", data)
-            self._ws.send(data)
+            id = _request_id()
             if callable(callback):
                 Connection._requests[id] = callback
+                if Metrics.enabled:
+                    Connection._in_flight[id] = (endpoint, time.perf_counter())
+            self._send(endpoint, payload, id)
+            return id
+        return None
 
-    def stream(self, endpoint: str) -> None:
+    def forget(self, reqid: str):
+        """Stop calling the callback of the request `reqid`, eg. once all expected replies arrived"""
+        Connection._requests.pop(reqid, None)
+        if Connection._in_flight.pop(reqid, None) is not None:
+            Metrics.set("connection_requests_in_flight", len(Connection._in_flight))
+
+    def stream(self, endpoint: str, callback = None, speculate: bool = False) -> None:
+        """Get a function which sends each chunk passed to it to `endpoint`.  
+        All chunks share one request id, `callback` is called with every reply. If `speculate` is set, partial NLU hypotheses
+        the server pushes as `$partial` in its replies are passed to `Intent.speculate` (using `endpoint` as stream).
+        Call `.close()` on the returned function once the stream ended to drop the callback"""
+        stream_id = _request_id()
+        def _on_reply(message):
+            if speculate and isinstance(message.get("$partial", None), dict):
+                Intent.speculate(message["$partial"], stream=endpoint)
+            if callable(callback):
+                callback(message)
         def _streaming_callback(data):
-            self.request(endpoint, data)
+            if self._can_send and self._ws is not None:
+                self._send(endpoint, data, stream_id)
+        if callable(callback) or speculate:
+            Connection._requests[stream_id] = _on_reply
+        _streaming_callback.close = lambda: self.forget(stream_id)
         return _streaming_callback
 
+    def _send(self, endpoint: str, payload: dict, id: str):
+        data = json.dumps({
+            **payload,
+            "$endpoint": endpoint,
+            "$devid": self.id,
+            "$reqid": id
+        }, separators=(",", ":"))
+        if self.debug:
+            print(">", data)
+        self._ws.send(data)
+        if Metrics.enabled:
+            Metrics.inc("connection_messages_total", direction="out")
+            Metrics.set("connection_requests_in_flight", len(Connection._in_flight))
+
     def _run(self):
         self._ws = websocket.WebSocketApp(f"ws://{self._h}:{self._p}",
                                             on_open=self._on_open,
@@ -60,12 +103,16 @@ class Connection:
     def reconnect(self, cb=None):
         if self._ws:
             self._ws.keep_running = False
+        if self._scheduler:
+            self._scheduler.start(self._dispatch)
         self._run()
         self.on_open = cb
 
     def disconnect(self):
         if self._ws:
             self._ws.keep_running = False
+        if self._scheduler:
+            self._scheduler.stop()
 
     def _on_open(self, ws):
         self._can_send = True
@@ -75,19 +122,45 @@ class Connection:
     def _on_message(self, ws, message):
         if self.debug:
             print("<", message)
+        priority_class = InboundScheduler.BACKGROUND
         try:
             message = json.loads(message)
-            print(message)
             if message.get("$control", None):
-                if callable(self.on_control_message):
-                    self.on_control_message(message)
-                return
-            id = message.get("$reqid", "")
-            cb = Connection._requests.get(id, None)
-            if callable(cb):
-                cb(message)
+                priority_class = InboundScheduler.CONTROL
+            else:
+                id = message.get("$reqid", "")
+                if Metrics.enabled:
+                    Metrics.inc("connection_messages_total", direction="in")
+                    sent = Connection._in_flight.pop(id, None)
+                    if sent is not None:
+                        Metrics.observe("connection_request_seconds", time.perf_counter() - sent[1], endpoint=sent[0])
+                    Metrics.set("connection_requests_in_flight", len(Connection._in_flight))
+                    Metrics.set("connection_pending_callbacks", len(Connection._requests))
+                if id in Connection._requests:
+                    priority_class = InboundScheduler.REPLY
+                elif "skill" in message and "intent" in message:
+                    priority_class = InboundScheduler.INTENT
         except Exception:
             traceback.print_exc()
+        if self._scheduler:
+            self._scheduler.put(priority_class, message)
+        else:
+            self._dispatch(message)
+
+    def _dispatch(self, message):
+        if isinstance(message, dict):
+            try:
+                if self.debug:
+                    print(message)
+                if message.get("$control", None):
+                    if callable(self.on_control_message):
+                        self.on_control_message(message)
+                    return
+                cb = Connection._requests.get(message.get("$reqid", ""), None)
+                if callable(cb):
+                    cb(message)
+            except Exception:
+                traceback.print_exc()
         if callable(self.on_message):
             self.on_message(message)
 
@@ -95,3 +168,42 @@ class Connection:
         self._can_send = False
         if callable(self.on_close):
             self.on_close(close_status_code)
+
+
+def _request_id() -> str:
+    return ''.join(random.choice("abcdef0123456789") for i in range(64))
+
+
+class WebSocketTransport():
+    """A single upstream websocket shared by all devices of a `MultiplexClient`"""
+
+    def __init__(self, host: str = "jarvis.fipsi.at", port: int = 5522) -> None:
+        self._h = host
+        self._p = port
+        self._ws = None
+        self._client = None
+        self._open = threading.Event()
+
+    def start(self, client):
+        self._client = client
+        self._ws = websocket.WebSocketApp(f"ws://{self._h}:{self._p}",
+                                            on_open=lambda ws: self._open.set(),
+                                            on_message=self._on_message,
+                                            on_close=lambda ws, code, text: self._open.clear())
+        self._ws.keep_running = True
+        t = threading.Thread(target=self._ws.run_forever)
+        t.daemon = True
+        t.start()
+
+    def send(self, data: str):
+        if not self._open.is_set():
+            raise ConnectionError("websocket is not open")
+        self._ws.send(data)
+
+    def close(self):
+        if self._ws:
+            self._ws.keep_running = False
+            self._ws.close()
+
+    def _on_message(self, ws, message):
+        self._client.loop.call_soon_threadsafe(self._client._receive, message)
@@ -3,7 +3,11 @@ Copyright (c) 2021 Philipp Scheer
 """
 
 
+from .Loader import Loader
+
 class IEntity():
+    __slots__ = ("data",)
+
     def __init__(self) -> None:
         self.data = {}
 
@@ -71,4 +75,35 @@ class Entity():
         
         Entity.register(test)
         ```"""
-        Entity._entities[entity_class.__name__] = entity_class
+        if Loader.staging() is not None:
+            Loader.staging()["entities"][entity_class.__name__] = entity_class
+        else:
+            Entity._entities = {**Entity._entities, entity_class.__name__: entity_class}
+
+    _lazy = {}
+    _loaded = {} # name -> (reference, module) of lazily imported entities
+
+    @staticmethod
+    def lazy(name: str, reference: str):
+        """Register an entity by reference, the module is only imported once a slot with this entity gets resolved  
+        Usage:
+        ```python
+        from jarvis_sdk import Entity
+
+        Entity.lazy("city", "skills.weather:city")
+        ```"""
+        Entity._lazy[name] = reference
+
+    @staticmethod
+    def get(name: str):
+        """Get a registered entity class by name, imports lazily registered entities if necessary.  
+        Returns `None` if no entity with the given name is known"""
+        entity_class = Entity._entities.get(name, None)
+        if entity_class is not None or name not in Entity._lazy:
+            return entity_class
+        entity_class = Loader.load(Entity._lazy[name])
+        if name not in Entity._entities:
+            Entity._entities = {**Entity._entities, name: entity_class}
+            Entity._loaded[name] = (Entity._lazy[name], entity_class.__module__)
+        Entity._lazy.pop(name, None)
+        return Entity._entities[name]
@@ -0,0 +1,269 @@
+"""
+Copyright (c) 2021 Philipp Scheer
+"""
+
+
+import os
+import sys
+import json
+import mmap
+import struct
+import threading
+from .Entity import IEntity
+
+
+class Gazetteer():
+    """A prebuilt, memory-mapped index of known entity values and their aliases.
+    Exact and alias lookups are binary searches over a sorted key table, fuzzy lookups use a trigram index.
+    The index file is mapped read-only, so all processes using the same file share its pages.
+    Usage:
+    ```python
+    from jarvis_sdk import Gazetteer
+
+    Gazetteer.build({"New York": ["NYC", "New York City"], "Vienna": ["Wien"]}, "cities.gaz")
+    # or from the command line:
+    # python -m jarvis_sdk.Gazetteer cities.json cities.gaz
+
+    cities = Gazetteer.open("cities.gaz")
+    cities.exact("nyc")          # "New York"
+    cities.fuzzy("new yrok")     # [("New York", 0.5)]
+    ```"""
+
+    MAGIC = b"JGAZ"
+    VERSION = 1
+    # magic, version, values, keys, grams, offsets of the value, key, gram, postings tables and the string blob
+    _HEADER = struct.Struct("<4sIIII5Q")
+    _VALUE = struct.Struct("<II")       # blob offset, length
+    _KEY = struct.Struct("<IIII")       # blob offset, length, value id, number of trigrams
+    _GRAM = struct.Struct("<IIII")      # blob offset, length, postings offset, postings count
+    _POSTING = struct.Struct("<I")      # key id
+
+    _opened = {}
+    _lock = threading.Lock()
+
+    def __init__(self, path: str) -> None:
+        """Map an index file, use `Gazetteer.open` to share one mapping per file"""
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, self._n_values, self._n_keys, self._n_grams,
+            self._values, self._keys, self._grams, self._postings, self._blob) = Gazetteer._HEADER.unpack_from(self._map, 0)
+        if magic != Gazetteer.MAGIC or version != Gazetteer.VERSION:
+            raise ValueError(f"{path} is not a gazetteer index of version {Gazetteer.VERSION}")
+
+    @staticmethod
+    def open(path: str):
+        """Get the shared `Gazetteer` for `path`, the file is only mapped once per process"""
+        path = os.path.abspath(path)
+        with Gazetteer._lock:
+            if path not in Gazetteer._opened:
+                Gazetteer._opened[path] = Gazetteer(path)
+            return Gazetteer._opened[path]
+
+    def __len__(self):
+        return self._n_values
+
+    def exact(self, text: str):
+        """Get the value whose name or alias matches `text` (case and whitespace insensitive), else `None`"""
+        key = _normalize(text).encode("utf-8")
+        lo, hi = 0, self._n_keys
+        while lo < hi:
+            mid = (lo + hi) // 2
+            candidate = self._key_bytes(mid)
+            if candidate < key:
+                lo = mid + 1
+            elif candidate > key:
+                hi = mid
+            else:
+                return self._value(Gazetteer._KEY.unpack_from(self._map, self._keys + mid * Gazetteer._KEY.size)[2])
+        return None
+
+    def prefix(self, text: str, limit: int = 10) -> list:
+        """Get up to `limit` values with a name or alias starting with `text`"""
+        key = _normalize(text).encode("utf-8")
+        lo, hi = 0, self._n_keys
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key_bytes(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        values = []
+        while lo < self._n_keys and len(values) < limit:
+            if not self._key_bytes(lo).startswith(key):
+                break
+            value = self._value(Gazetteer._KEY.unpack_from(self._map, self._keys + lo * Gazetteer._KEY.size)[2])
+            if value not in values:
+                values.append(value)
+            lo += 1
+        return values
+
+    def fuzzy(self, text: str, threshold: float = 0.5, limit: int = 5) -> list:
+        """Get up to `limit` `(value, similarity)` tuples whose trigram similarity (dice coefficient) with `text`
+        reaches `threshold`, best match first"""
+        grams = _trigrams(_normalize(text))
+        if len(grams) == 0:
+            return []
+        common = {}
+        for gram in grams:
+            index = self._find_gram(gram.encode("utf-8"))
+            if index is None:
+                continue
+            _, _, offset, count = Gazetteer._GRAM.unpack_from(self._map, self._grams + index * Gazetteer._GRAM.size)
+            for (key_id,) in Gazetteer._POSTING.iter_unpack(self._map[self._postings + offset * 4:self._postings + (offset + count) * 4]):
+                common[key_id] = common.get(key_id, 0) + 1
+        best = {}
+        for key_id, shared in common.items():
+            _, _, value_id, n_grams = Gazetteer._KEY.unpack_from(self._map, self._keys + key_id * Gazetteer._KEY.size)
+            score = 2 * shared / (len(grams) + n_grams)
+            if score >= threshold and score > best.get(value_id, 0):
+                best[value_id] = score
+        ranked = sorted(best.items(), key=lambda x: x[1], reverse=True)[:limit]
+        return [(self._value(value_id), score) for value_id, score in ranked]
+
+    def lookup(self, text: str, threshold: float = 0.5):
+        """Exact or alias match, falls back to the best fuzzy match, else `None`"""
+        value = self.exact(text)
+        if value is not None or threshold is None:
+            return value
+        matches = self.fuzzy(text, threshold, limit=1)
+        return matches[0][0] if len(matches) > 0 else None
+
+    def close(self):
+        self._map.close()
+
+    def _string(self, offset: int, length: int) -> bytes:
+        return self._map[self._blob + offset:self._blob + offset + length]
+
+    def _key_bytes(self, index: int) -> bytes:
+        offset, length, _, _ = Gazetteer._KEY.unpack_from(self._map, self._keys + index * Gazetteer._KEY.size)
+        return self._string(offset, length)
+
+    def _value(self, value_id: int) -> str:
+        offset, length = Gazetteer._VALUE.unpack_from(self._map, self._values + value_id * Gazetteer._VALUE.size)
+        return self._string(offset, length).decode("utf-8")
+
+    def _find_gram(self, gram: bytes):
+        lo, hi = 0, self._n_grams
+        while lo < hi:
+            mid = (lo + hi) // 2
+            offset, length, _, _ = Gazetteer._GRAM.unpack_from(self._map, self._grams + mid * Gazetteer._GRAM.size)
+            candidate = self._string(offset, length)
+            if candidate < gram:
+                lo = mid + 1
+            elif candidate > gram:
+                hi = mid
+            else:
+                return mid
+        return None
+
+    @staticmethod
+    def build(entries, path: str):
+        """Build an index file from a dict `{value: [aliases]}` or an iterable of `(value, [aliases])` tuples"""
+        if isinstance(entries, dict):
+            entries = entries.items()
+        blob = bytearray()
+        strings = {}
+        def _intern(string: str):
+            data = string.encode("utf-8")
+            if data not in strings:
+                strings[data] = (len(blob), len(data))
+                blob.extend(data)
+            return strings[data]
+
+        values = []
+        keys = {}
+        for value, aliases in entries:
+            value_id = len(values)
+            values.append(_intern(value))
+            for name in [value, *aliases]:
+                keys.setdefault(_normalize(name).encode("utf-8"), value_id)
+        sorted_keys = sorted(keys)
+        grams = {}
+        key_table = bytearray()
+        for key_id, key in enumerate(sorted_keys):
+            key_grams = _trigrams(key.decode("utf-8"))
+            for gram in key_grams:
+                grams.setdefault(gram.encode("utf-8"), []).append(key_id)
+            key_table += Gazetteer._KEY.pack(*_intern(key.decode("utf-8")), keys[key], len(key_grams))
+        gram_table = bytearray()
+        postings = bytearray()
+        for gram in sorted(grams):
+            gram_table += Gazetteer._GRAM.pack(*_intern(gram.decode("utf-8")), len(postings) // 4, len(grams[gram]))
+            for key_id in grams[gram]:
+                postings += Gazetteer._POSTING.pack(key_id)
+        value_table = b"".join(Gazetteer._VALUE.pack(*value) for value in values)
+
+        values_offset = Gazetteer._HEADER.size
+        keys_offset = values_offset + len(value_table)
+        grams_offset = keys_offset + len(key_table)
+        postings_offset = grams_offset + len(gram_table)
+        blob_offset = postings_offset + len(postings)
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(Gazetteer._HEADER.pack(Gazetteer.MAGIC, Gazetteer.VERSION, len(values), len(sorted_keys), len(grams),
+                                           values_offset, keys_offset, grams_offset, postings_offset, blob_offset))
+            for part in (value_table, key_table, gram_table, postings, blob):
+                f.write(part)
+        os.replace(tmp, path)
+        with Gazetteer._lock:
+            # other threads may still be reading the old mapping, it is unmapped once garbage collected
+            Gazetteer._opened.pop(os.path.abspath(path), None)
+
+
+class GazetteerEntity(IEntity):
+    """Base class for entities resolving slot text against a `Gazetteer` index file.
+    Usage:
+    ```python
+    from jarvis_sdk import Entity, GazetteerEntity
+
+    class city(GazetteerEntity):
+        index = "cities.gaz"
+        fuzzy = 0.6      # minimum similarity of fuzzy matches, None to only allow exact and alias matches
+
+    Entity.register(city)
+    ```
+    `resolve()` returns the canonical value or `None` if nothing matched"""
+    __slots__ = ()
+
+    index = None
+    fuzzy = 0.5
+
+    @classmethod
+    def gazetteer(cls) -> Gazetteer:
+        assert cls.index is not None, f"{cls.__name__}.index has to be set to the path of a gazetteer index"
+        return Gazetteer.open(cls.index)
+
+    def resolve(self):
+        text = self.data.get("rawValue", None) or self.data.get("value", {}).get("value", None)
+        if not isinstance(text, str):
+            return None
+        return self.gazetteer().lookup(text, self.fuzzy)
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.casefold().split())
+
+def _trigrams(text: str) -> set:
+    padded = f" {text} "
+    return set(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Usage: python -m jarvis_sdk.Gazetteer <input.json|input.tsv> <output.gaz>")
+        print("  json: {\"value\": [\"alias\", ...], ...}")
+        print("  tsv:  one value per line, followed by its aliases, separated by tabs")
+        sys.exit(1)
+    source, target = sys.argv[1:]
+    if source.endswith(".json"):
+        entries = json.load(open(source, "r", encoding="utf-8"))
+    else:
+        entries = []
+        with open(source, "r", encoding="utf-8") as f:
+            for line in f:
+                columns = [c.strip() for c in line.rstrip("\n").split("\t") if c.strip()]
+                if len(columns) > 0:
+                    entries.append((columns[0], columns[1:]))
+    Gazetteer.build(entries, target)
+    print(f"Wrote {len(Gazetteer(target))} values to {target}")
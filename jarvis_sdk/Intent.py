@@ -3,9 +3,16 @@ Copyright (c) 2021 Philipp Scheer
 """
 
 
+import json
+import time
 import random
+import functools
 import traceback
 from .Entity import Entity, IEntity
+from .Loader import Loader
+from .Metrics import Metrics
+from .Breaker import CircuitBreaker, HandlerGuard
+from .Speculation import Speculation
 
 
 
@@ -15,8 +22,12 @@ class Intent():
     You'll probably only need the `.on` method"""
 
     @staticmethod
-    def on(skill: str, intent: str):
+    def on(skill: str, intent: str, timeout: float = None, max_concurrency: int = None, breaker: CircuitBreaker = None, fallback = None, cache = None):
         """Listen to a captured Intent.  
+        Optionally limit the handler with a deadline in seconds (`timeout`), a maximum number of parallel calls (`max_concurrency`)
+        and a `CircuitBreaker` which temporarily skips the handler if it fails too often.
+        If given, the `fallback` IntentResponse is returned whenever the handler is skipped, fails or times out.  
+        Deterministic handlers may pass a `ResponseCache` as `cache` to answer repeated queries without running the handler.  
         Usage:
         ```python
         from jarvis_sdk import Intent, IntentResponse, IntentTextResponses
@@ -69,28 +80,209 @@ class Intent():
             return True
         ```"""
         try:
+            assert fallback is None or isinstance(fallback, IntentResponse), "fallback has to be None or instance of IntentResponse"
             def decor(func):
+                target = func
+                if timeout is not None or max_concurrency is not None or breaker is not None:
+                    target = HandlerGuard(func, f"{skill}${intent}${func.__name__}", timeout=timeout,
+                                          max_concurrency=max_concurrency, breaker=breaker, fallback=fallback)
+                    if Loader.staging() is not None:
+                        Loader.staging()["guards"][target.name] = target
+                    else:
+                        Intent._guards = {**Intent._guards, target.name: target}
+                if cache is not None:
+                    target = cache.wrap(target, f"{skill}${intent}${func.__name__}")
+                    if Loader.staging() is not None:
+                        Loader.staging()["caches"].append((skill, intent, cache, func.__module__))
+                    else:
+                        Intent._caches = [*Intent._caches, (skill, intent, cache, func.__module__)]
+                @functools.wraps(func)
                 def wrap(*args, **kwargs):
-                    res = func(*args, **kwargs)
+                    res = target(*args, **kwargs)
                     return res
                 id = ''.join(random.choice("0123456789abcdef") for _ in range(64))
                 while (skill, intent, id) in Intent._handlers:
                     id = ''.join(random.choice("0123456789abcdef") for _ in range(64))
-                Intent._handlers[(skill, intent, id)] = wrap
+                if Loader.staging() is not None:
+                    Loader.staging()["handlers"][(skill, intent, id)] = wrap
+                else:
+                    # copy on write, so running `_emit` calls keep iterating over their snapshot
+                    Intent._handlers = {**Intent._handlers, (skill, intent, id): wrap}
                 return wrap
             return decor
         except Exception as e:
             raise e
 
     _handlers = {}
+    _guards = {}
+
+    @staticmethod
+    def prefetch(skill: str, intent: str):
+        """Register a prefetch hook which runs in the background as soon as a partial NLU hypothesis
+        for Skill$intent exceeds `Intent.speculation_threshold`, while the user is still speaking.
+        If the final result matches the hypothesis, the handler can pick up the hook's return value.  
+        Usage:
+        ```python
+        from jarvis_sdk import Intent, Api
+
+        @Intent.prefetch("Weather", "getWeather")
+        def fetch_forecast(captured_data):
+            return Api.endpoint("/weather", {"city": captured_data.slots.city_name})
+
+        @Intent.on("Weather", "getWeather")
+        def Weather_getWeather(captured_data):
+            forecast = captured_data.prefetched("fetch_forecast")
+            if forecast is None:
+                # no (matching) speculation, fetch it now
+                forecast = fetch_forecast(captured_data)
+            ...
+        ```"""
+        def decor(func):
+            Speculation.register(skill, intent, func)
+            return func
+        return decor
+
+    speculation_threshold = 0.8
+
+    @staticmethod
+    def speculate(nlu_result, stream: str = "default") -> bool:
+        """Feed a partial NLU hypothesis, returns `True` if a speculation is running for it.  
+        Hypotheses below `Intent.speculation_threshold` are ignored, a new hypothesis for the same `stream`
+        cancels a differing running speculation. The next `Intent._emit` for the `stream` commits or discards it"""
+        try:
+            captured_intent_data = nlu_result if isinstance(nlu_result, CapturedIntentData) else CapturedIntentData.decode(nlu_result)
+        except IntentDataError:
+            return False
+        if captured_intent_data.data.get("probability", 0) < Intent.speculation_threshold:
+            return False
+        Speculation.start(captured_intent_data, stream)
+        return True
+
+    @staticmethod
+    def speculation_stats() -> dict:
+        """Get counters of started, hit, missed and cancelled speculations and the hit rate"""
+        return Speculation.stats()
+    _caches = []
+
+    @staticmethod
+    def invalidate(skill: str = "*", intent: str = "*"):
+        """Drop cached responses of all memoized handlers for the given skill and intent, `"*"` matches everything"""
+        for (cachedSkill, cachedIntent, cache, _) in Intent._caches:
+            if skill == "*" or cachedSkill in (skill, "*"):
+                if intent == "*" or cachedIntent in (intent, "*"):
+                    cache.invalidate(skill, intent)
+    _lazy = []
+    _loaded = [] # lazy entries registered by `_load_lazy`, with the module of the handler
+
+    @staticmethod
+    def lazy(skill: str, intent: str, reference: str, **options):
+        """Register a handler by `module:function` reference without importing it.  
+        The module gets imported on the first matching utterance. If the module registers its handlers itself
+        using `@Intent.on`, these registrations are used, else the referenced function is registered with the given `options`
+        (the keyword arguments of `Intent.on`).  
+        Usage:
+        ```python
+        from jarvis_sdk import Intent
+
+        Intent.lazy("Weather", "getWeather", "skills.weather:Weather_getWeather", timeout=2)
+        ```"""
+        assert isinstance(reference, str) and ":" in reference, f"reference has to look like 'module:function', got {reference!r}"
+        Intent._lazy.append((skill, intent, reference, options))
+
+    @staticmethod
+    def load_manifest(path_or_dict):
+        """Lazily register all intents and entities listed in a skill manifest.  
+        The manifest is a json file (or an already loaded dict) which looks like:
+        ```json
+        {
+            "intents": [
+                {
+                    "skill": "Weather",
+                    "intent": "getWeather",
+                    "handler": "skills.weather:Weather_getWeather",
+                    "timeout": 2
+                }
+            ],
+            "entities": {
+                "city": "skills.weather:city"
+            }
+        }
+        ```
+        All keys of an intent except `skill`, `intent` and `handler` are passed to `Intent.on`"""
+        manifest = path_or_dict
+        if not isinstance(manifest, dict):
+            with open(path_or_dict, "r") as f:
+                manifest = json.load(f)
+        for entry in manifest.get("intents", []):
+            options = {k: v for k, v in entry.items() if k not in ("skill", "intent", "handler")}
+            Intent.lazy(entry["skill"], entry["intent"], entry["handler"], **options)
+        for name, reference in manifest.get("entities", {}).items():
+            Entity.lazy(name, reference)
+
+    @staticmethod
+    def discover(group: str = "jarvis_sdk"):
+        """Lazily register all skills installed as python packages.  
+        Packages declare their handlers in the `{group}.intents` entry point group, using `Skill$intent` as name,
+        and their entities in the `{group}.entities` group, using the entity name as name:
+        ```python
+        setuptools.setup(
+            ...
+            entry_points={
+                "jarvis_sdk.intents": ["Weather$getWeather = skills.weather:Weather_getWeather"],
+                "jarvis_sdk.entities": ["city = skills.weather:city"]
+            }
+        )
+        ```"""
+        for name, reference in _entry_points(f"{group}.intents"):
+            skill, intent = name.split("$", 1)
+            Intent.lazy(skill, intent, reference)
+        for name, reference in _entry_points(f"{group}.entities"):
+            Entity.lazy(name, reference)
+
+    @staticmethod
+    def _load_lazy(skillNameToGet, intentNameToGet):
+        """Import all lazily registered handlers matching Skill$intent"""
+        matching = [entry for entry in Intent._lazy if _lazy_matches(entry, skillNameToGet, intentNameToGet)]
+        for entry in matching:
+            (skill, intent, reference, options) = entry
+            try:
+                func = Loader.load(reference)
+                if func not in Intent._handlers.values():
+                    Intent.on(skill, intent, **options)(func)
+                    # the module does not register this handler itself, a reload has to do it again
+                    Intent._loaded.append((*entry, func.__module__))
+            except Exception:
+                # a broken skill must not take down the others, and is not retried on every utterance
+                print(f"Failed to load handler {reference} for {skill}${intent}")
+                traceback.print_exc()
+            Intent._lazy.remove(entry)
+
+    @staticmethod
+    def breakers() -> dict:
+        """Get the state of all circuit breakers, keyed by `Skill$intent$handler`  
+        Example:
+        ```python
+        {
+            "Weather$getWeather$Weather_getWeather": {
+                "state": "open",
+                "calls": 20,
+                "failures": 14,
+                "opened_at": 1617184812.12
+            }
+        }
+        ```"""
+        return {name: guard.breaker.json() for name, guard in Intent._guards.items() if guard.breaker is not None}
 
     @staticmethod
     def _get(skillNameToGet, intentNameToGet):
         """Get matching functions for Skill$intent from handlers dict,  
         else return the default route"""
+        # only lock if something has to be imported, a running reload must not block other utterances
+        if any(_lazy_matches(entry, skillNameToGet, intentNameToGet) for entry in Intent._lazy):
+            with Loader._lock:
+                Intent._load_lazy(skillNameToGet, intentNameToGet)
         endpoints = []
-        for (skillName, intentName, id) in Intent._handlers:
-            endpoint = Intent._handlers[(skillName, intentName, id)]
+        for (skillName, intentName, id), endpoint in Intent._handlers.items():
             if skillNameToGet == skillName or skillName == "*":
                 if intentNameToGet == intentName or intentName == "*":
                     endpoints.append(endpoint)
@@ -99,20 +291,36 @@ class Intent():
         return endpoints
 
     @staticmethod
-    def _emit(skill: str, intent: str, nlu_result: dict) -> set:
+    def _emit(skill: str, intent: str, nlu_result: dict, stream: str = "default") -> set:
         """Emit a Skill$Intent event with given arguments  
+        `nlu_result` may be a dict, a `CapturedIntentData` or the raw json `bytes`/`str` (see `CapturedIntentData.decode`).
+        Dicts are the parsed results of the server and are wrapped without format checks  
         Returns a tuple with `(True|False, object result)`"""
         try:
             endpoints = Intent._get(skill, intent)
             result = None
-            captured_intent_data = CapturedIntentData(nlu_result) # might be faster to only compute this once if there are cpu-heavy tasks inside later on
+            if isinstance(nlu_result, CapturedIntentData):
+                captured_intent_data = nlu_result
+            elif isinstance(nlu_result, (bytes, bytearray, memoryview, str)):
+                captured_intent_data = CapturedIntentData.decode(nlu_result)
+            elif isinstance(nlu_result, dict):
+                captured_intent_data = CapturedIntentData._trusted(nlu_result)
+            else:
+                captured_intent_data = CapturedIntentData(nlu_result)
+            if len(Speculation._active) > 0:
+                Speculation.commit(captured_intent_data, stream)
             for endpoint in endpoints:
+                start = time.perf_counter() if Metrics.enabled else None
                 try:
                     res = endpoint(captured_intent_data)
                 except Exception as e:
                     res = e
+                    Metrics.inc("intent_handler_errors_total", skill=skill, intent=intent, handler=endpoint.__name__)
+                if start is not None:
+                    Metrics.observe("intent_handler_seconds", time.perf_counter() - start, skill=skill, intent=intent, handler=endpoint.__name__)
+                if isinstance(res, Exception):
                     print(f"Exception occured in endpoint {skill}${intent}")
-                    traceback.print_exc()
+                    traceback.print_exception(type(res), res, res.__traceback__)
                 if isinstance(res, IntentResponse):
                     result = res
             return (True, result)
@@ -125,13 +333,34 @@ class Intent():
         raise Exception("Endpoint not found")
 
 
+def _lazy_matches(entry: tuple, skill: str, intent: str) -> bool:
+    return (skill == entry[0] or entry[0] == "*") and (intent == entry[1] or entry[1] == "*")
+
+def _entry_points(group: str) -> list:
+    """Get a list of `(name, "module:attribute")` tuples for an entry point group"""
+    try:
+        from importlib import metadata
+    except ImportError: # python < 3.8
+        import pkg_resources
+        return [(ep.name, f"{ep.module_name}:{'.'.join(ep.attrs)}") for ep in pkg_resources.iter_entry_points(group)]
+    entry_points = metadata.entry_points()
+    if hasattr(entry_points, "select"):
+        entry_points = entry_points.select(group=group)
+    else:
+        entry_points = entry_points.get(group, [])
+    return [(ep.name, ep.value) for ep in entry_points]
+
+
 class IIntentResponse():
+    __slots__ = ()
+
     def __init__(self) -> None:
         pass
 
 
 class IntentTextResponse(IIntentResponse):
     """Class to handle and format text responses for Intent requests."""
+    __slots__ = ("responses",)
 
     def __init__(self, responses: list) -> None:
         """Initalize a new instance with a list of possible responses"""
@@ -219,25 +448,44 @@ class IntentTextResponse(IIntentResponse):
 
 
 class IntentSpeechResponse(IIntentResponse):
-    def __init__(self) -> None:
+    """Class to handle and format spoken responses for Intent requests.  
+    Works like `IntentTextResponse`, the picked sentence gets synthesized (see `RenderCache`)"""
+    __slots__ = ("responses",)
+
+    def __init__(self, responses: list = None) -> None:
+        """Initalize a new instance with a list of possible responses"""
         super().__init__()
-        self.responses = []
+        self.responses = [] if responses is None else responses
+
+    def apply_values(self, value_dict: dict):
+        """Apply a dictionary of values to the response list, see `IntentTextResponse.apply_values`"""
+        return IntentTextResponse.apply_values(self, value_dict)
     
     def __dict__(self):
         return self.responses
 
 
 class IntentCardResponse(IIntentResponse):
-    def __init__(self) -> None:
+    """A graphical response, holds arbitrary json fields which the UI renders as card.  
+    Usage:
+    ```python
+    IntentCardResponse(head="Weather Report", body="Sunny, 34°C", image="https://...")
+    ```"""
+    __slots__ = ("fields",)
+
+    def __init__(self, **fields) -> None:
         super().__init__()
+        self.fields = fields
     
     def __dict__(self):
-        return []
+        return self.fields
 
 
 
 class IntentResponse():
     """A container for all different response types"""
+    __slots__ = ("text", "speech", "card")
+
     def __init__(self, text: IntentTextResponse=None, speech: IntentSpeechResponse=None, card: IntentCardResponse=None) -> None:
         """
         Usage:
@@ -285,11 +533,11 @@ class IntentResponse():
     def pick_results(self, function) -> dict:
         """Let a function pick results.  
         This function should pick the best response based on the user input"""
-        return ResolvedIntentResponse(**{
-            "text": function(self.text) if isinstance(self.text, IntentTextResponse) else None,
-            "speech": function(self.speech) if isinstance(self.speech, IntentSpeechResponse) else None,
-            "card": self.card,
-        })
+        return ResolvedIntentResponse(
+            text=function(self.text) if isinstance(self.text, IntentTextResponse) else None,
+            speech=function(self.speech) if isinstance(self.speech, IntentSpeechResponse) else None,
+            card=self.card,
+        )
     
     def __dict__(self):
         return {
@@ -298,9 +546,33 @@ class IntentResponse():
             "card": self.card if self.card is None else self.card.__dict__(),
         }
 
+    def to_json(self):
+        return self.__dict__()
+
+    @classmethod
+    def from_json(cls, obj: dict):
+        """Rebuild an IntentResponse from the output of `.to_json()`"""
+        text = speech = card = None
+        if obj.get("text", None) is not None:
+            text = IntentTextResponse(obj["text"])
+        if obj.get("speech", None) is not None:
+            speech = IntentSpeechResponse(obj["speech"])
+        if obj.get("card", None) is not None:
+            card = IntentCardResponse(**(obj["card"] if isinstance(obj["card"], dict) else {}))
+        return cls._trusted(text=text, speech=speech, card=card)
+
+    @classmethod
+    def _trusted(cls, text=None, speech=None, card=None):
+        """Construct without type checks, only use with values of the correct type"""
+        obj = cls.__new__(cls)
+        obj.text = text
+        obj.speech = speech
+        obj.card = card
+        return obj
+
     @classmethod
     def single_text(cls, txt):
-        return cls(text=IntentTextResponse([txt]))
+        return cls._trusted(text=IntentTextResponse([txt]))
 
     @classmethod
     def single_speech(cls, speech):
@@ -312,11 +584,13 @@ class IntentResponse():
 
     @classmethod
     def empty(cls):
-        return cls()
+        return cls._trusted()
 
 
 class ResolvedIntentResponse():
     """Resolved intent responses"""
+    __slots__ = ("text", "speech", "card")
+
     def __init__(self, text: IntentTextResponse=None, speech: IntentSpeechResponse=None, card: IntentCardResponse=None) -> None:
         assert text   is None or isinstance(text,   str),  f"text has to be None or instance of str, got {text.__class__.__name__}"
         # TODO: audio:
@@ -346,6 +620,8 @@ class ResolvedIntentResponse():
 class CapturedIntentData:
     """A wrapper around Intents classified by Jarvis NLU.  
     Exposes some useful functions"""
+    __slots__ = ("data", "_slots", "_prefetched")
+
     def __init__(self, data) -> None:
         """Initialize with the data object obtained by Jarvis NLU.  
         Looks like:  
@@ -375,12 +651,56 @@ class CapturedIntentData:
         ```
         """
         self.data = data
+        self._slots = None
+        self._prefetched = None
         assert isinstance(self.data, dict), "Data does not have required format: dict"
         for k in ["input", "skill", "intent", "probability", "slots"]:
             assert k in self.data, f"Data does not have required format: '{k}' missing"
 
+    @classmethod
+    def _trusted(cls, data: dict):
+        """Wrap data which is already known to have the required format, skips all checks"""
+        obj = cls.__new__(cls)
+        obj.data = data
+        obj._slots = None
+        obj._prefetched = None
+        return obj
+
+    @classmethod
+    def decode(cls, payload, validate: bool = True):
+        """Decode a NLU result into a CapturedIntentData.  
+        `payload` may be the raw `bytes` or `str` received from the server or an already parsed dict.
+        All slots are turned into `IntentSlot` records and, unless `validate` is `False`, types and ranges
+        of the result and every slot are checked up front. Raises `IntentDataError` for malformed data.  
+        Usage:
+        ```python
+        from jarvis_sdk import CapturedIntentData
+
+        data = CapturedIntentData.decode(b'{"input": "How\'s the weather in New York?", "skill": "Weather", ...}')
+        data.slots.city_name # "New York"
+        ```"""
+        if isinstance(payload, (bytes, bytearray, memoryview, str)):
+            try:
+                data = json.loads(bytes(payload) if isinstance(payload, memoryview) else payload)
+            except ValueError as e:
+                raise IntentDataError(f"Invalid json: {e}")
+        else:
+            data = payload
+        if not isinstance(data, dict):
+            raise IntentDataError("Data does not have required format: dict")
+        slots = data.get("slots", None)
+        if isinstance(slots, list):
+            # never modify the caller's dict, it may still be serialized or passed on
+            data = {**data, "slots": [IntentSlot.from_json(slot) if isinstance(slot, dict) else slot for slot in slots]}
+        if validate:
+            _validate(data)
+        return cls._trusted(data)
+
     def to_json(self):
         """Export CapturedIntentData to json string"""
+        slots = self.data.get("slots", None)
+        if isinstance(slots, list) and any(isinstance(slot, IntentSlot) for slot in slots):
+            return {**self.data, "slots": [slot.json() if isinstance(slot, IntentSlot) else slot for slot in slots]}
         return self.data
     
     @classmethod
@@ -421,7 +741,9 @@ class CapturedIntentData:
         }]
         ```
         """
-        return IntentSlotsContainer(self.data.get("slots", []))
+        if self._slots is None:
+            self._slots = IntentSlotsContainer(self.data.get("slots", []))
+        return self._slots
     
     @property
     def input(self) -> str:
@@ -430,6 +752,17 @@ class CapturedIntentData:
         """
         return self.data.get("input", "")
 
+    def prefetched(self, hook_name: str, default=None, timeout: float = None):
+        """Get the result of a prefetch hook (see `Intent.prefetch`) which ran speculatively for this intent.  
+        Waits up to `timeout` seconds for a still running hook (`None` waits until it finished).
+        Returns `default` if there was no matching speculation or the hook failed"""
+        if self._prefetched is None or hook_name not in self._prefetched:
+            return default
+        try:
+            return self._prefetched[hook_name].result(timeout)
+        except Exception:
+            return default
+
     def get_slot_value(self, slot_name, default=None):
         """Get the slot value for a given `slot_name`, if `slot_name` could not be found, return the `default` value
         Example:
@@ -449,9 +782,109 @@ class CapturedIntentData:
         return default
 
 
+class IntentDataError(ValueError):
+    """Raised if a NLU result does not have the required format"""
+    pass
+
+
+class IntentSlot:
+    """A typed slot record created by `CapturedIntentData.decode`.  
+    Supports `.get(key, default)` and `slot[key]` with the original json keys (`slotName`, `rawValue`, `range`, ...),
+    so handlers written for plain slot dicts keep working"""
+    __slots__ = ("slot_name", "entity", "raw_value", "value", "start", "end", "resolved")
+
+    _KEYS = {
+        "slotName": "slot_name",
+        "entity": "entity",
+        "rawValue": "raw_value",
+        "value": "value",
+        "resolved": "resolved",
+    }
+
+    def __init__(self, slot_name: str, entity: str, raw_value: str, value: dict, start: int, end: int, resolved = None) -> None:
+        self.slot_name = slot_name
+        self.entity = entity
+        self.raw_value = raw_value
+        self.value = value
+        self.start = start
+        self.end = end
+        self.resolved = resolved
+
+    def get(self, key: str, default = None):
+        if key == "range":
+            return {"start": self.start, "end": self.end}
+        attribute = IntentSlot._KEYS.get(key, None)
+        if attribute is None:
+            return default
+        value = getattr(self, attribute)
+        return default if value is None else value
+
+    def __getitem__(self, key: str):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key: str):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def json(self):
+        data = {
+            "range": {"start": self.start, "end": self.end},
+            "rawValue": self.raw_value,
+            "value": self.value,
+            "entity": self.entity,
+            "slotName": self.slot_name
+        }
+        if self.resolved is not None:
+            data["resolved"] = self.resolved
+        return data
+
+    @classmethod
+    def from_json(cls, data: dict):
+        slot_range = data.get("range", None)
+        if isinstance(slot_range, dict):
+            start, end = slot_range.get("start", None), slot_range.get("end", None)
+        else:
+            start, end = None, None
+        return cls(data.get("slotName", None), data.get("entity", None), data.get("rawValue", None),
+                   data.get("value", None), start, end, data.get("resolved", None))
+
+
+_MISSING = object()
+
+
+def _validate(data: dict):
+    """Check the types and ranges of a NLU result whose slots are already decoded"""
+    for key, types in (("input", str), ("skill", str), ("intent", str), ("probability", (int, float)), ("slots", list)):
+        if key not in data:
+            raise IntentDataError(f"Data does not have required format: '{key}' missing")
+        if not isinstance(data[key], types) or isinstance(data[key], bool):
+            raise IntentDataError(f"Data does not have required format: '{key}' has type {data[key].__class__.__name__}")
+    if not 0 <= data["probability"] <= 1:
+        raise IntentDataError(f"probability has to be in [0, 1], got {data['probability']}")
+    length = len(data["input"])
+    for i, slot in enumerate(data["slots"]):
+        if not isinstance(slot, IntentSlot):
+            raise IntentDataError(f"slot {i} is not a slot object")
+        if not isinstance(slot.slot_name, str) or slot.slot_name == "":
+            raise IntentDataError(f"slot {i} has no slotName")
+        if not isinstance(slot.entity, str):
+            raise IntentDataError(f"slot {slot.slot_name} has no entity")
+        if not isinstance(slot.raw_value, str):
+            raise IntentDataError(f"slot {slot.slot_name} has no rawValue")
+        # the other keys depend on the kind, eg. "value" for Custom, "from"/"to" for TimeInterval, "years"... for Duration
+        if not isinstance(slot.value, dict) or not isinstance(slot.value.get("kind", None), str):
+            raise IntentDataError(f"slot {slot.slot_name} has no value with a kind")
+        if type(slot.start) is not int or type(slot.end) is not int or not 0 <= slot.start <= slot.end <= length:
+            raise IntentDataError(f"slot {slot.slot_name} has an invalid range ({slot.start}, {slot.end}) for an input of length {length}")
+
+
 class IntentSlotsContainer:
     """Internal class to simplify slot value extraction.  
     You should not call this class"""
+    __slots__ = ("_slots",)
+
     def __init__(self, slots: list) -> None:
         self._slots = slots
     
@@ -461,12 +894,16 @@ class IntentSlotsContainer:
                 if slot.get("slotName", None) == key:
                     if slot.get("resolved", None) is not None:
                         return slot.get("resolved", None)
-                    AnyEntity: IEntity = Entity._entities.get(slot.get("entity", None), None)
+                    AnyEntity: IEntity = Entity.get(slot.get("entity", None))
                     if AnyEntity is None:
                         return slot.get("value", {}).get("value", None)
                     entity = AnyEntity()
                     entity._set_slot_data(slot)
-                    return entity.resolve()
+                    if not Metrics.enabled:
+                        return entity.resolve()
+                    Metrics.inc("entity_resolve_total", entity=AnyEntity.__name__)
+                    with Metrics.timer("entity_resolve_seconds", entity=AnyEntity.__name__):
+                        return entity.resolve()
             return None
         except Exception:
             for slot in self._slots:
@@ -0,0 +1,64 @@
+"""
+Copyright (c) 2021 Philipp Scheer
+"""
+
+
+import time
+import importlib
+import threading
+from .Metrics import Metrics
+
+
+class Loader():
+    """Import skill handlers and entities on demand from `module:attribute` references
+    and keep track of how long each import took.
+    You'll probably only need `Loader.report()`, references are registered using `Intent.lazy`, `Entity.lazy` or `Intent.load_manifest`"""
+
+    _import_times = {}
+    _lock = threading.RLock()
+    _staging = threading.local()
+
+    @staticmethod
+    def staging():
+        """Get the registrations collected while the current thread reloads a skill module, else `None`.
+        Looks like `{"handlers": {}, "guards": {}, "caches": [], "entities": {}}`"""
+        return getattr(Loader._staging, "registrations", None)
+
+    @staticmethod
+    def load(reference: str):
+        """Import the module of a `module:attribute` reference and return the attribute"""
+        assert isinstance(reference, str) and ":" in reference, f"reference has to look like 'module:attribute', got {reference!r}"
+        module_name, attribute = reference.split(":", 1)
+        with Loader._lock:
+            module = Loader.import_module(module_name)
+        obj = module
+        for part in attribute.split("."):
+            obj = getattr(obj, part)
+        return obj
+
+    @staticmethod
+    def import_module(module_name: str):
+        """Import a module and record the time spent, already imported modules are returned immediately"""
+        with Loader._lock:
+            if module_name in Loader._import_times:
+                return importlib.import_module(module_name)
+            start = time.perf_counter()
+            module = importlib.import_module(module_name)
+            took = time.perf_counter() - start
+            Loader._import_times[module_name] = took
+        Metrics.observe("skill_import_seconds", took, module=module_name)
+        return module
+
+    @staticmethod
+    def report() -> list:
+        """Get the import cost of all lazily loaded modules, most expensive first
+        Example:
+        ```python
+        [
+            {"module": "skills.weather", "seconds": 0.2143},
+            {"module": "skills.timer",   "seconds": 0.0031}
+        ]
+        ```"""
+        with Loader._lock:
+            times = list(Loader._import_times.items())
+        return [{"module": module, "seconds": took} for module, took in sorted(times, key=lambda x: x[1], reverse=True)]
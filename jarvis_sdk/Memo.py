@@ -0,0 +1,146 @@
+"""
+Copyright (c) 2021 Philipp Scheer
+"""
+
+
+import os
+import json
+import time
+import atexit
+import hashlib
+import functools
+import threading
+import traceback
+from collections import OrderedDict
+from .Metrics import Metrics
+from .Intent import IntentResponse
+
+
+class ResponseCache():
+    """Memoize the responses of deterministic intent handlers.
+    The cache key is a hash of the handler, the skill, the intent and the resolved values of all slots,
+    so a handler must only depend on these. Handlers returning anything else than an IntentResponse are not cached.
+    Usage:
+    ```python
+    from jarvis_sdk import Intent, IntentResponse, ResponseCache
+
+    @Intent.on("Units", "convert", cache=ResponseCache(maxsize=1000, ttl=24 * 60 * 60, path="units.cache.json"))
+    def Units_convert(captured_data):
+        # only runs if this combination of slot values was not seen in the last 24 hours
+        ...
+
+    Intent.invalidate("Units", "convert")
+    # drops all cached responses of matching handlers
+    ```"""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = None, path: str = None) -> None:
+        """`maxsize`: maximum number of cached responses, the least recently used ones are dropped first
+        `ttl`: seconds until a cached response expires, `None` to never expire
+        `path`: json file to persist the cache across restarts, saved on exit and with `.save()`"""
+        assert maxsize > 0, "maxsize has to be greater than 0"
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.path = path
+        self._entries = OrderedDict()  # key -> (expires, skill, intent, IntentResponse)
+        self._lock = threading.Lock()
+        if self.path is not None:
+            self.load()
+            atexit.register(self.save)
+
+    def wrap(self, func, name: str):
+        """Return a handler which answers from the cache and only calls `func` on a miss"""
+        # fallbacks of guarded handlers signal a failure and must not be cached
+        fallback = getattr(func, "fallback", None)
+        @functools.wraps(func)
+        def memoized(captured_intent_data, *args, **kwargs):
+            key = ResponseCache.key(captured_intent_data, name)
+            response = self.get(key)
+            if response is not None:
+                Metrics.inc("intent_cache_hits_total", handler=name)
+                return response
+            Metrics.inc("intent_cache_misses_total", handler=name)
+            response = func(captured_intent_data, *args, **kwargs)
+            if isinstance(response, IntentResponse) and response is not fallback:
+                self.put(key, response, captured_intent_data.skill, captured_intent_data.intent)
+            return response
+        return memoized
+
+    @staticmethod
+    def key(captured_intent_data, name: str = None) -> str:
+        """Canonical hash of the handler `name`, skill, intent and resolved slot values"""
+        container = captured_intent_data.slots
+        values = {}
+        for slot in container:
+            slot_name = slot.get("slotName", None)
+            if slot_name is not None:
+                values[slot_name] = getattr(container, slot_name)
+        canonical = json.dumps([name, captured_intent_data.skill, captured_intent_data.intent, values],
+                               sort_keys=True, separators=(",", ":"), default=repr)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        """Get a cached response or `None`"""
+        with self._lock:
+            entry = self._entries.get(key, None)
+            if entry is None:
+                return None
+            if entry[0] is not None and entry[0] < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[3]
+
+    def put(self, key: str, response: IntentResponse, skill: str = None, intent: str = None):
+        """Cache a response"""
+        expires = None if self.ttl is None else time.time() + self.ttl
+        with self._lock:
+            self._entries[key] = (expires, skill, intent, response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, skill: str = "*", intent: str = "*"):
+        """Drop all cached responses for the given skill and intent, `"*"` matches everything"""
+        with self._lock:
+            for key in [k for k, (_, s, i, _) in self._entries.items()
+                            if (skill == "*" or s == skill) and (intent == "*" or i == intent)]:
+                del self._entries[key]
+
+    def clear(self):
+        """Drop all cached responses"""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def save(self):
+        """Write all unexpired entries to `path`"""
+        if self.path is None:
+            return
+        now = time.time()
+        with self._lock:
+            entries = [[key, expires, skill, intent, response.to_json()]
+                            for key, (expires, skill, intent, response) in self._entries.items()
+                            if expires is None or expires >= now]
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(entries, f)
+        os.replace(tmp, self.path)
+
+    def load(self):
+        """Load previously saved entries from `path`"""
+        if self.path is None or not os.path.exists(self.path):
+            return
+        try:
+            entries = json.load(open(self.path, "r"))
+        except Exception:
+            traceback.print_exc()
+            return
+        now = time.time()
+        with self._lock:
+            for key, expires, skill, intent, response in entries:
+                if expires is None or expires >= now:
+                    self._entries[key] = (expires, skill, intent, IntentResponse.from_json(response))
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
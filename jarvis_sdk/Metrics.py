@@ -0,0 +1,261 @@
+"""
+Copyright (c) 2021 Philipp Scheer
+"""
+
+
+import os
+import time
+import threading
+import traceback
+
+
+class Metrics():
+    """Lightweight counters, gauges and latency histograms for the SDK.
+    Metrics are disabled by default and every recording call returns immediately until `Metrics.enable()` is called.
+    Usage:
+    ```python
+    from jarvis_sdk import Metrics, PrometheusFileSink
+
+    Metrics.enable()
+    Metrics.add_sink(PrometheusFileSink("/var/lib/node_exporter/jarvis.prom"))
+
+    with Metrics.timer("my_task_seconds", task="cleanup"):
+        do_something()
+
+    Metrics.flush()
+    # writes all collected samples to every registered sink
+    ```"""
+
+    enabled = False
+    BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+    _counters = {}
+    _gauges = {}
+    _histograms = {}
+    _sinks = []
+    _lock = threading.Lock()
+
+    @staticmethod
+    def enable():
+        """Start recording metrics"""
+        Metrics.enabled = True
+
+    @staticmethod
+    def disable():
+        """Stop recording metrics, already collected values are kept"""
+        Metrics.enabled = False
+
+    @staticmethod
+    def reset():
+        """Drop all collected values"""
+        with Metrics._lock:
+            Metrics._counters = {}
+            Metrics._gauges = {}
+            Metrics._histograms = {}
+
+    @staticmethod
+    def inc(name: str, value: float = 1, **labels):
+        """Increase the counter `name` by `value`"""
+        if not Metrics.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with Metrics._lock:
+            Metrics._counters[key] = Metrics._counters.get(key, 0) + value
+
+    @staticmethod
+    def set(name: str, value: float, **labels):
+        """Set the gauge `name` to `value`"""
+        if not Metrics.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with Metrics._lock:
+            Metrics._gauges[key] = value
+
+    @staticmethod
+    def observe(name: str, value: float, **labels):
+        """Record `value` in the histogram `name`"""
+        if not Metrics.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with Metrics._lock:
+            histogram = Metrics._histograms.get(key, None)
+            if histogram is None:
+                histogram = Metrics._histograms[key] = _Histogram(Metrics.BUCKETS)
+            histogram.observe(value)
+
+    @staticmethod
+    def timer(name: str, **labels):
+        """Return a context manager which records the time spent inside it in the histogram `name`"""
+        if not Metrics.enabled:
+            return _NOOP_TIMER
+        return _Timer(name, labels)
+
+    @staticmethod
+    def collect() -> list:
+        """Get a snapshot of all collected values as a list of samples
+        Each sample looks like:
+        ```python
+        {
+            "name": "intent_handler_seconds",
+            "type": "histogram",                    # or "counter", "gauge"
+            "labels": {"skill": "Weather", "intent": "getWeather", "handler": "Weather_getWeather"},
+            "value": {"count": 3, "sum": 0.012, "buckets": [[0.001, 0], [0.0025, 1], ...]}
+        }
+        ```"""
+        samples = []
+        with Metrics._lock:
+            for (name, labels), value in Metrics._counters.items():
+                samples.append({"name": name, "type": "counter", "labels": dict(labels), "value": value})
+            for (name, labels), value in Metrics._gauges.items():
+                samples.append({"name": name, "type": "gauge", "labels": dict(labels), "value": value})
+            for (name, labels), histogram in Metrics._histograms.items():
+                samples.append({"name": name, "type": "histogram", "labels": dict(labels), "value": histogram.json()})
+        return samples
+
+    @staticmethod
+    def prometheus() -> str:
+        """Render all collected values in the Prometheus text exposition format"""
+        def _labels(labels: dict, extra: dict = {}):
+            labels = {**labels, **extra}
+            if len(labels) == 0:
+                return ""
+            return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in sorted(labels.items())) + "}"
+
+        lines = []
+        declared = set()
+        # all samples of a metric have to follow its TYPE line
+        for sample in sorted(Metrics.collect(), key=lambda sample: sample["name"]):
+            name = sample["name"]
+            if name not in declared:
+                lines.append(f"# TYPE {name} {sample['type']}")
+                declared.add(name)
+            if sample["type"] == "histogram":
+                value = sample["value"]
+                for bound, count in value["buckets"]:
+                    lines.append(f"{name}_bucket{_labels(sample['labels'], {'le': bound})} {count}")
+                lines.append(f"{name}_bucket{_labels(sample['labels'], {'le': '+Inf'})} {value['count']}")
+                lines.append(f"{name}_sum{_labels(sample['labels'])} {value['sum']}")
+                lines.append(f"{name}_count{_labels(sample['labels'])} {value['count']}")
+            else:
+                lines.append(f"{name}{_labels(sample['labels'])} {sample['value']}")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def add_sink(sink):
+        """Register a sink, must be an instance of `IMetricsSink`"""
+        assert isinstance(sink, IMetricsSink), "sink has to be an instance of IMetricsSink"
+        Metrics._sinks.append(sink)
+
+    @staticmethod
+    def remove_sink(sink):
+        """Unregister a previously added sink"""
+        if sink in Metrics._sinks:
+            Metrics._sinks.remove(sink)
+
+    @staticmethod
+    def flush():
+        """Export the current snapshot to all registered sinks"""
+        if len(Metrics._sinks) == 0:
+            return
+        samples = Metrics.collect()
+        for sink in list(Metrics._sinks):
+            try:
+                sink.export(samples)
+            except Exception:
+                traceback.print_exc()
+
+
+class IMetricsSink():
+    """Base class for metric exporters"""
+
+    def export(self, samples: list):
+        """Receive a list of samples as returned by `Metrics.collect()`"""
+        pass
+
+
+class PrometheusFileSink(IMetricsSink):
+    """Write all metrics to a text file which can be picked up by the node exporter textfile collector"""
+
+    def __init__(self, path: str) -> None:
+        super().__init__()
+        self.path = path
+
+    def export(self, samples: list):
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            f.write(Metrics.prometheus())
+        os.replace(tmp, self.path)
+
+
+class CallbackSink(IMetricsSink):
+    """Call a function for each sample, useful to bridge into OpenTelemetry or StatsD
+    Usage:
+    ```python
+    def forward(name, type, labels, value):
+        meter.record(name, value, attributes=labels)
+
+    Metrics.add_sink(CallbackSink(forward))
+    ```"""
+
+    def __init__(self, callback) -> None:
+        super().__init__()
+        assert callable(callback), "callback has to be callable"
+        self.callback = callback
+
+    def export(self, samples: list):
+        for sample in samples:
+            self.callback(sample["name"], sample["type"], sample["labels"], sample["value"])
+
+
+class _Histogram():
+    def __init__(self, buckets: tuple) -> None:
+        self.bounds = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.bounds):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def json(self):
+        cumulative = 0
+        buckets = []
+        for bound, count in zip(self.bounds, self.counts):
+            cumulative += count
+            buckets.append([bound, cumulative])
+        return {"count": self.count, "sum": self.sum, "buckets": buckets}
+
+
+class _Timer():
+    def __init__(self, name: str, labels: dict) -> None:
+        self.name = name
+        self.labels = labels
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        Metrics.observe(self.name, time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+class _NoopTimer():
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        return False
+
+
+_NOOP_TIMER = _NoopTimer()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
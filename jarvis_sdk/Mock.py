@@ -0,0 +1,73 @@
+"""
+Copyright (c) 2021 Philipp Scheer
+"""
+
+
+import json
+import random
+
+
+class MockServer():
+    """In-process stand-in for the Jarvis server, usable as transport of a `MultiplexClient`.
+    Every request is answered with an echo of its payload unless a handler is registered for its endpoint.
+    Requests can steer the server with a `$mock` key:
+    ```python
+    {"$mock": {"delay": 0.2}}   # reply after 200ms
+    {"$mock": {"fail": True}}   # reply with {"success": False, "error": "MOCK_FAILURE"}
+    {"$mock": {"drop": True}}   # never reply
+    ```
+    `delay` and `fail_rate` set the defaults for all requests.
+    Usage:
+    ```python
+    from jarvis_sdk import MultiplexClient, MockServer
+
+    server = MockServer(delay=0.01, fail_rate=0.05)
+    server.on("weather/get", lambda payload: {"temperature": 21})
+    client = MultiplexClient(server)
+    ```"""
+
+    def __init__(self, delay: float = 0, fail_rate: float = 0) -> None:
+        self.delay = delay
+        self.fail_rate = fail_rate
+        self.received = 0
+        self._handlers = {}
+        self._client = None
+
+    def on(self, endpoint: str, handler):
+        """Answer requests to `endpoint` with the dict returned by `handler(payload)`"""
+        assert callable(handler), "handler has to be callable"
+        self._handlers[endpoint] = handler
+
+    def push(self, message: dict):
+        """Push a message to the client, eg. a `$control` message or a broadcast for a `$devid`"""
+        self._client.loop.call_soon_threadsafe(self._client._receive, json.dumps(message))
+
+    def start(self, client):
+        self._client = client
+
+    def send(self, data: str):
+        """Receive a request from the client, must be called on the client's event loop"""
+        self.received += 1
+        message = json.loads(data)
+        command = message.pop("$mock", {})
+        if command.get("drop", False):
+            return
+        endpoint = message.get("$endpoint", None)
+        reply = {"$reqid": message.get("$reqid", None), "$devid": message.get("$devid", None)}
+        if command.get("fail", False) or (self.fail_rate > 0 and random.random() < self.fail_rate):
+            reply.update({"success": False, "error": "MOCK_FAILURE"})
+        elif endpoint in self._handlers:
+            try:
+                reply.update({"success": True, "result": self._handlers[endpoint](message)})
+            except Exception as e:
+                reply.update({"success": False, "error": str(e)})
+        else:
+            reply.update({"success": True, "result": {k: v for k, v in message.items() if not k.startswith("$")}})
+        delay = command.get("delay", self.delay)
+        if delay > 0:
+            self._client.loop.call_later(delay, self._client._receive, json.dumps(reply))
+        else:
+            self._client.loop.call_soon(self._client._receive, json.dumps(reply))
+
+    def close(self):
+        self._client = None
@@ -0,0 +1,241 @@
+"""
+Copyright (c) 2021 Philipp Scheer
+"""
+
+
+import json
+import time
+import random
+import asyncio
+import threading
+import traceback
+from .Metrics import Metrics
+from .Mock import MockServer
+
+
+class MultiplexClient():
+    """Host many devices on a single event loop thread, sharing one transport.
+    Outgoing requests are tagged with the `$devid` of their device, replies are routed back by `$reqid`
+    and other messages by `$devid`. The transport is either a `WebSocketTransport` (one upstream socket
+    for all devices) or a `MockServer` for tests and load generation without network.
+    Usage:
+    ```python
+    from jarvis_sdk import MultiplexClient, WebSocketTransport
+
+    client = MultiplexClient(WebSocketTransport("jarvis.fipsi.at", 5522))
+    client.start()
+    kitchen = client.device("kitchen")
+    kitchen.on_message = lambda message: print("kitchen got", message)
+    kitchen.request("status/get", {}, lambda reply: print(reply))
+
+    # or from a coroutine on the client's loop
+    reply = client.run(kitchen.call("status/get", {}, timeout=5))
+    ```"""
+
+    def __init__(self, transport) -> None:
+        self.transport = transport
+        self.loop = asyncio.new_event_loop()
+        self._devices = {}
+        self._callbacks = {}  # reqid -> callback, kept for streams with multiple replies
+        self._futures = {}    # reqid -> future, removed by the first reply
+        self._thread = None
+
+    def start(self):
+        """Start the event loop thread and the transport"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self.loop.run_forever, name="jarvis-multiplex")
+        self._thread.daemon = True
+        self._thread.start()
+        self.transport.start(self)
+
+    def stop(self):
+        """Stop the transport and the event loop thread"""
+        if self._thread is None:
+            return
+        self.loop.call_soon_threadsafe(self.transport.close)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self._thread = None
+
+    def run(self, coroutine, timeout: float = None):
+        """Run a coroutine on the client's loop from another thread and return its result"""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result(timeout)
+
+    def device(self, device_id: str):
+        """Get the `VirtualDevice` for `device_id`, created on first use"""
+        if device_id not in self._devices:
+            self._devices[device_id] = VirtualDevice(self, device_id)
+        return self._devices[device_id]
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._futures)
+
+    def _send(self, device_id: str, endpoint: str, payload: dict, reqid: str, callback = None, future = None):
+        """Send a request, must run on the event loop"""
+        if callable(callback):
+            self._callbacks[reqid] = callback
+        if future is not None:
+            self._futures[reqid] = future
+        try:
+            self.transport.send(json.dumps({
+                **payload,
+                "$endpoint": endpoint,
+                "$devid": device_id,
+                "$reqid": reqid
+            }, separators=(",", ":")))
+        except Exception as e:
+            self._callbacks.pop(reqid, None)
+            self._futures.pop(reqid, None)
+            if future is not None and not future.done():
+                future.set_exception(e)
+            else:
+                traceback.print_exc()
+        Metrics.set("multiplex_requests_in_flight", len(self._futures))
+
+    def _receive(self, message: str):
+        """Route an inbound message, must run on the event loop"""
+        try:
+            message = json.loads(message)
+        except Exception:
+            traceback.print_exc()
+            return
+        reqid = message.get("$reqid", None)
+        future = self._futures.pop(reqid, None)
+        if future is not None and not future.done():
+            future.set_result(message)
+        callback = self._callbacks.get(reqid, None)
+        if callable(callback):
+            self._call(callback, message)
+        if future is not None or callback is not None:
+            return
+        device = self._devices.get(message.get("$devid", None), None)
+        targets = [device] if device is not None else list(self._devices.values())
+        for device in targets:
+            handler = device.on_control_message if message.get("$control", None) else device.on_message
+            if callable(handler):
+                self._call(handler, message)
+
+    def _call(self, function, message):
+        try:
+            function(message)
+        except Exception:
+            traceback.print_exc()
+
+
+class VirtualDevice():
+    """A device hosted by a `MultiplexClient`, offers the request interface of `Connection`"""
+
+    def __init__(self, client: MultiplexClient, device_id: str) -> None:
+        self.client = client
+        self.id = device_id
+        self.on_message = None
+        self.on_control_message = None
+
+    def request(self, endpoint: str, payload: dict = {}, callback = None) -> str:
+        """Send a request from any thread, `callback` is called on the event loop with every reply.
+        Returns the request id"""
+        reqid = _request_id()
+        self.client.loop.call_soon_threadsafe(self.client._send, self.id, endpoint, payload, reqid, callback)
+        return reqid
+
+    def forget(self, reqid: str):
+        """Stop calling the callback of the request `reqid`"""
+        self.client.loop.call_soon_threadsafe(self.client._callbacks.pop, reqid, None)
+
+    async def call(self, endpoint: str, payload: dict = {}, timeout: float = 10) -> dict:
+        """Send a request and wait for the first reply, must be awaited on the client's loop.
+        Raises `asyncio.TimeoutError` if no reply arrives within `timeout` seconds"""
+        reqid = _request_id()
+        future = self.client.loop.create_future()
+        self.client._send(self.id, endpoint, payload, reqid, future=future)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self.client._futures.pop(reqid, None)
+
+
+class LoadGenerator():
+    """Measure request latency and throughput of the client stack with many simulated devices.
+    Runs against an in-process `MockServer` unless another client is given.
+    Usage:
+    ```python
+    from jarvis_sdk import LoadGenerator, MockServer
+
+    report = LoadGenerator(devices=500, requests=20, server=MockServer(delay=0.005, fail_rate=0.01)).run()
+    print(report["throughput"], report["latency"]["p99"])
+    ```"""
+
+    def __init__(self, devices: int = 100, requests: int = 10, endpoint: str = "load/test", payload: dict = {}, timeout: float = 10,
+                 server: MockServer = None, client: MultiplexClient = None) -> None:
+        self.devices = devices
+        self.requests = requests
+        self.endpoint = endpoint
+        self.payload = payload
+        self.timeout = timeout
+        self.client = client if client is not None else MultiplexClient(server if server is not None else MockServer())
+
+    def run(self) -> dict:
+        """Run the load test and return a report like:
+        ```python
+        {
+            "devices": 100, "requests": 1000, "errors": 3, "timeouts": 0,
+            "seconds": 0.41, "throughput": 2439.0,
+            "latency": {"p50": 0.0001, "p90": 0.0002, "p99": 0.0011, "max": 0.0020}
+        }
+        ```"""
+        started = self.client._thread is None
+        self.client.start()
+        try:
+            return self.client.run(self._run())
+        finally:
+            if started:
+                self.client.stop()
+
+    async def _run(self):
+        latencies = []
+        counts = {"errors": 0, "timeouts": 0}
+        async def _device(device: VirtualDevice):
+            for _ in range(self.requests):
+                start = time.perf_counter()
+                try:
+                    reply = await device.call(self.endpoint, self.payload, self.timeout)
+                except asyncio.TimeoutError:
+                    counts["timeouts"] += 1
+                    continue
+                except Exception:
+                    counts["errors"] += 1
+                    continue
+                latencies.append(time.perf_counter() - start)
+                if reply.get("success", True) is False:
+                    counts["errors"] += 1
+        start = time.perf_counter()
+        await asyncio.gather(*[_device(self.client.device(f"load-{i}")) for i in range(self.devices)])
+        took = time.perf_counter() - start
+        latencies.sort()
+        total = self.devices * self.requests
+        return {
+            "devices": self.devices,
+            "requests": total,
+            "errors": counts["errors"],
+            "timeouts": counts["timeouts"],
+            "seconds": took,
+            "throughput": total / took if took > 0 else None,
+            "latency": {
+                "p50": _percentile(latencies, 0.5),
+                "p90": _percentile(latencies, 0.9),
+                "p99": _percentile(latencies, 0.99),
+                "max": latencies[-1] if latencies else None
+            }
+        }
+
+
+def _request_id() -> str:
+    return "%064x" % random.getrandbits(256)
+
+
+def _percentile(values: list, p: float):
+    if len(values) == 0:
+        return None
+    return values[min(len(values) - 1, int(p * len(values)))]
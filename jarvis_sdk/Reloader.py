@@ -0,0 +1,140 @@
+"""
+Copyright (c) 2021 Philipp Scheer
+"""
+
+
+import os
+import sys
+import time
+import importlib
+import threading
+import traceback
+from .Intent import Intent
+from .Entity import Entity
+from .Loader import Loader
+from .Metrics import Metrics
+from .Speculation import Speculation
+
+
+class Reloader():
+    """Re-import changed skill modules without restarting the process.
+    The handlers and entities of a reloaded module are swapped in a single step, running `Intent._emit` calls
+    finish with the handlers they started with. Connections, sessions and caches of other skills stay untouched.
+    Usage:
+    ```python
+    from jarvis_sdk import Reloader
+
+    Reloader.watch()
+    # polls the files of all modules which registered handlers or entities
+
+    Reloader.watch("skills.weather", "skills.timer", interval=0.5)
+    # or only the given modules
+
+    Reloader.reload("skills.weather")
+    # reload once, returns the time it took in seconds
+    ```"""
+
+    _mtimes = {}
+    _thread = None
+    _lock = threading.Lock()
+    _stop = threading.Event()
+
+    @staticmethod
+    def reload(module_name: str) -> float:
+        """Reload a skill module and atomically replace its handlers and entities.
+        If the module fails to import, its namespace is restored, the previous handlers and entities stay active and the error is raised"""
+        start = time.perf_counter()
+        module = sys.modules.get(module_name, None)
+        assert module is not None, f"module {module_name} is not loaded"
+        # other threads keep handling utterances and importing lazy skills while the module re-imports,
+        # registrations of this thread are collected in `Loader.staging()` until then
+        with Reloader._lock:
+            staging = {"handlers": {}, "guards": {}, "caches": [], "entities": {}}
+            namespace = dict(module.__dict__)
+            hooks = Speculation._hooks
+            Speculation._hooks = {key: [hook for hook in h if hook.__module__ != module_name] for key, h in hooks.items()}
+            Loader._staging.registrations = staging
+            try:
+                importlib.reload(module)
+                # lazily loaded handlers and entities were registered by the loader, not by the module itself
+                for (skill, intent, reference, options, handler_module) in list(Intent._loaded):
+                    if handler_module == module_name:
+                        func = Loader.load(reference)
+                        if func not in staging["handlers"].values():
+                            Intent.on(skill, intent, **options)(func)
+                for name, (reference, entity_module) in list(Entity._loaded.items()):
+                    if entity_module == module_name and name not in staging["entities"]:
+                        staging["entities"][name] = Loader.load(reference)
+            except BaseException:
+                # the old handlers keep running, give them back the globals the failed import partly replaced
+                module.__dict__.clear()
+                module.__dict__.update(namespace)
+                Speculation._hooks = hooks
+                raise
+            finally:
+                Loader._staging.registrations = None
+            with Loader._lock:
+                Intent._handlers = {**{key: handler for key, handler in Intent._handlers.items() if handler.__module__ != module_name},
+                                    **staging["handlers"]}
+                Entity._entities = {**{name: entity for name, entity in Entity._entities.items() if entity.__module__ != module_name},
+                                    **staging["entities"]}
+                # breakers and response caches of the old code are replaced by the ones the reload registered
+                Intent._guards = {**{name: guard for name, guard in Intent._guards.items() if guard.func.__module__ != module_name},
+                                  **staging["guards"]}
+                Intent._caches = [entry for entry in Intent._caches if entry[3] != module_name] + staging["caches"]
+        took = time.perf_counter() - start
+        Metrics.observe("skill_reload_seconds", took, module=module_name)
+        return took
+
+    @staticmethod
+    def watch(*modules, interval: float = 1):
+        """Poll the source files of `modules` (all modules with registered handlers or entities if none are given)
+        every `interval` seconds in a background thread and reload them on change"""
+        Reloader.stop()
+        Reloader._stop = threading.Event()
+        Reloader._mtimes = {}
+        for module_name in modules or _skill_modules():
+            path = _source(module_name)
+            if path is not None:
+                Reloader._mtimes[module_name] = os.stat(path).st_mtime
+        Reloader._thread = threading.Thread(target=Reloader._loop, args=(Reloader._stop, interval, len(modules) == 0), name="jarvis-reloader")
+        Reloader._thread.daemon = True
+        Reloader._thread.start()
+
+    @staticmethod
+    def stop():
+        """Stop watching"""
+        Reloader._stop.set()
+
+    @staticmethod
+    def _loop(stop: threading.Event, interval: float, discover: bool):
+        while not stop.wait(interval):
+            if discover:
+                for module_name in _skill_modules():
+                    if module_name not in Reloader._mtimes and _source(module_name) is not None:
+                        Reloader._mtimes[module_name] = os.stat(_source(module_name)).st_mtime
+            for module_name, mtime in list(Reloader._mtimes.items()):
+                try:
+                    current = os.stat(_source(module_name)).st_mtime
+                    if current == mtime:
+                        continue
+                    Reloader._mtimes[module_name] = current
+                    took = Reloader.reload(module_name)
+                    print(f"Reloaded {module_name} in {took * 1000:.1f}ms")
+                except Exception:
+                    print(f"Failed to reload {module_name}")
+                    traceback.print_exc()
+
+
+def _skill_modules() -> set:
+    """Modules which registered handlers or entities, except the SDK itself"""
+    modules = set(handler.__module__ for handler in Intent._handlers.values())
+    modules.update(entity.__module__ for entity in Entity._entities.values())
+    return set(m for m in modules if m in sys.modules and m != "__main__" and not m.startswith("jarvis_sdk"))
+
+def _source(module_name: str):
+    module = sys.modules.get(module_name, None)
+    path = getattr(module, "__file__", None)
+    if path is None or not os.path.exists(path):
+        return None
+    return path
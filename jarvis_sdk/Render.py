@@ -0,0 +1,229 @@
+"""
+Copyright (c) 2021 Philipp Scheer
+"""
+
+
+import os
+import json
+import mmap
+import time
+import struct
+import hashlib
+import threading
+from .Metrics import Metrics
+from .Intent import IntentResponse, ResolvedIntentResponse, IntentTextResponse, IntentSpeechResponse, IntentCardResponse
+
+
+class IRenderer():
+    """Base class for renderers turning speech text and card fields into bytes.
+    Bump `version` whenever the output changes, so cached renderings of older versions are not served anymore"""
+    name = "renderer"
+    version = "1"
+
+    def speech(self, text: str) -> bytes:
+        """Synthesize a sentence, eg. into a wav file"""
+        pass
+
+    def card(self, fields: dict) -> bytes:
+        """Render the fields of an `IntentCardResponse`"""
+        return json.dumps(fields, sort_keys=True, separators=(",", ":")).encode("utf-8")
+
+
+class StubRenderer(IRenderer):
+    """Renderer for tests, "synthesizes" speech into a silent mono 16 bit wav whose length depends on the text"""
+    name = "stub"
+    version = "1"
+
+    def __init__(self, sample_rate: int = 16000, seconds_per_char: float = 0.01) -> None:
+        self.sample_rate = sample_rate
+        self.seconds_per_char = seconds_per_char
+        self.rendered = 0
+
+    def speech(self, text: str) -> bytes:
+        self.rendered += 1
+        samples = int(len(text) * self.seconds_per_char * self.sample_rate)
+        data = bytes(samples * 2)
+        header = struct.pack("<4sI4s4sIHHIIHH4sI", b"RIFF", 36 + len(data), b"WAVE", b"fmt ", 16, 1, 1,
+                             self.sample_rate, self.sample_rate * 2, 2, 16, b"data", len(data))
+        return header + data
+
+    def card(self, fields: dict) -> bytes:
+        self.rendered += 1
+        return super().card(fields)
+
+
+class RenderCache():
+    """Content-addressed on-disk cache for rendered speech and cards.
+    Renderings are stored under the hash of their kind, the renderer name and version and the rendered text or card fields,
+    so every distinct reply is only rendered once. Cached renderings are returned as read-only memoryviews over
+    a memory-mapped file, without copying them into the process. The least recently used files are evicted
+    once the cache exceeds `max_bytes`.
+    Usage:
+    ```python
+    from jarvis_sdk import RenderCache, IntentTextResponse
+
+    cache = RenderCache("/var/cache/jarvis/render", MySynthesizer(), max_bytes=512 * 1024 * 1024)
+    cache.prewarm(IntentTextResponse.load(responses))
+    # renders all fully formatted sentences of the response catalog up front
+
+    rendered = cache.render(resolved_intent_response)
+    rendered["speech"] # memoryview of the wav file, or None
+    rendered["card"]   # memoryview of the rendered card, or None
+    ```"""
+
+    def __init__(self, path: str, renderer: IRenderer, max_bytes: int = 256 * 1024 * 1024) -> None:
+        assert isinstance(renderer, IRenderer), "renderer has to be an instance of IRenderer"
+        assert type(renderer).speech is not IRenderer.speech, f"{type(renderer).__name__} has to implement speech()"
+        self.path = path
+        self.renderer = renderer
+        self.max_bytes = max_bytes
+        self._index = {}  # key -> [size, last used]
+        self._size = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.path, exist_ok=True)
+        self._scan()
+
+    def key(self, kind: str, payload) -> str:
+        """Content address of a rendering"""
+        canonical = json.dumps([kind, self.renderer.name, self.renderer.version, payload], sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def speech(self, text: str) -> memoryview:
+        """Get the synthesized `text`, renders it on a cache miss"""
+        return self._get_or_render("speech", text, self.renderer.speech)
+
+    def card(self, fields: dict) -> memoryview:
+        """Get the rendered card `fields`, renders them on a cache miss"""
+        return self._get_or_render("card", fields, self.renderer.card)
+
+    def render(self, response) -> dict:
+        """Render the speech and card of a `ResolvedIntentResponse`.
+        If no speech is given, the text is spoken instead"""
+        assert isinstance(response, ResolvedIntentResponse), "response has to be an instance of ResolvedIntentResponse"
+        spoken = response.speech if response.speech is not None else response.text
+        card = response.card.__dict__() if isinstance(response.card, IntentCardResponse) else response.card
+        return {
+            "speech": self.speech(spoken) if isinstance(spoken, str) and spoken != "" else None,
+            "card": self.card(card) if isinstance(card, dict) and len(card) > 0 else None,
+        }
+
+    def prewarm(self, catalog) -> int:
+        """Render all sentences and cards of a response catalog (as returned by `IntentTextResponse.load`),
+        an `IntentResponse` or a list of those. Sentences which still contain `$placeholders` are skipped.
+        Returns the number of renderings which were not cached yet"""
+        rendered = 0
+        for kind, payload in _catalog_items(catalog):
+            if kind == "speech" and "$" in payload:
+                continue
+            if self.key(kind, payload) not in self._index:
+                self._get_or_render(kind, payload, self.renderer.speech if kind == "speech" else self.renderer.card)
+                rendered += 1
+        return rendered
+
+    @property
+    def size(self) -> int:
+        """Total size of all cached renderings in bytes"""
+        return self._size
+
+    def clear(self):
+        """Delete all cached renderings"""
+        with self._lock:
+            for key in list(self._index):
+                self._remove(key)
+
+    def _get_or_render(self, kind: str, payload, render) -> memoryview:
+        key = self.key(kind, payload)
+        view = self._open(key)
+        if view is not None:
+            Metrics.inc("render_cache_hits_total", kind=kind)
+            return view
+        Metrics.inc("render_cache_misses_total", kind=kind)
+        with Metrics.timer("render_seconds", kind=kind, renderer=self.renderer.name):
+            data = render(payload)
+        if len(data) > self.max_bytes:
+            # storing it would evict everything else and then itself
+            return memoryview(data)
+        self._store(key, data)
+        view = self._open(key)
+        return view if view is not None else memoryview(data)
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.path, key[:2], key[2:])
+
+    def _open(self, key: str):
+        with self._lock:
+            entry = self._index.get(key, None)
+            if entry is None:
+                return None
+            entry[1] = time.time()
+        try:
+            with open(self._file(key), "rb") as f:
+                if entry[0] == 0:
+                    return memoryview(b"")
+                return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        except FileNotFoundError:
+            with self._lock:
+                if self._index.pop(key, None) is not None:
+                    self._size -= entry[0]
+            return None
+
+    def _store(self, key: str, data: bytes):
+        target = self._file(key)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        tmp = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, target)
+        with self._lock:
+            if key not in self._index:
+                self._size += len(data)
+            self._index[key] = [len(data), time.time()]
+            if self._size > self.max_bytes:
+                for old in sorted(self._index, key=lambda k: self._index[k][1]):
+                    if self._size <= self.max_bytes:
+                        break
+                    self._remove(old)
+            Metrics.set("render_cache_bytes", self._size)
+
+    def _remove(self, key: str):
+        """Must be called with the lock held"""
+        size, _ = self._index.pop(key)
+        self._size -= size
+        try:
+            os.remove(self._file(key))
+        except FileNotFoundError:
+            pass
+
+    def _scan(self):
+        """Index renderings left by previous runs, using the modification time as last use"""
+        for prefix in os.listdir(self.path):
+            directory = os.path.join(self.path, prefix)
+            if len(prefix) != 2 or not os.path.isdir(directory):
+                continue
+            for rest in os.listdir(directory):
+                if rest.endswith(".tmp"):
+                    continue
+                stat = os.stat(os.path.join(directory, rest))
+                self._index[prefix + rest] = [stat.st_size, stat.st_mtime]
+                self._size += stat.st_size
+
+
+def _catalog_items(catalog):
+    """Yield `(kind, payload)` tuples for everything renderable in a response catalog"""
+    if isinstance(catalog, dict):
+        for value in catalog.values():
+            yield from _catalog_items(value)
+    elif isinstance(catalog, (list, tuple)):
+        for value in catalog:
+            if isinstance(value, str):
+                yield ("speech", value)
+            else:
+                yield from _catalog_items(value)
+    elif isinstance(catalog, (IntentTextResponse, IntentSpeechResponse)):
+        yield from _catalog_items(catalog.responses)
+    elif isinstance(catalog, IntentCardResponse) and len(catalog.fields) > 0:
+        yield ("card", catalog.fields)
+    elif isinstance(catalog, IntentResponse):
+        for part in (catalog.speech if catalog.speech is not None else catalog.text, catalog.card):
+            if part is not None:
+                yield from _catalog_items(part)
@@ -0,0 +1,131 @@
+"""
+Copyright (c) 2021 Philipp Scheer
+"""
+
+
+import time
+import threading
+import traceback
+from collections import deque
+from .Metrics import Metrics
+
+
+class InboundScheduler():
+    """Dispatch inbound messages by priority class instead of arrival order.
+    Every class has a bounded queue, queues are served by weighted round robin so control messages and replies
+    overtake bursts of background traffic without starving them. Background messages carrying a coalesce key
+    (`$topic` by default) replace a still queued message with the same key instead of queueing up.
+    If a queue is full, its oldest message is dropped.
+    Usage:
+    ```python
+    from jarvis_sdk import Connection, InboundScheduler
+
+    con = Connection("my-device-id", scheduler=InboundScheduler(weights={"background": 1, "reply": 8}))
+    # pass scheduler=False to handle messages on the websocket thread in arrival order
+    ```"""
+
+    CONTROL = "control"
+    REPLY = "reply"
+    INTENT = "intent"
+    BACKGROUND = "background"
+    CLASSES = (CONTROL, REPLY, INTENT, BACKGROUND)
+
+    def __init__(self, weights: dict = {}, limits: dict = {}, coalesce_key: str = "$topic") -> None:
+        """`weights`: messages taken from each class per round, defaults to control 8, reply 4, intent 2, background 1
+        `limits`: maximum queue length per class
+        `coalesce_key`: message key whose value identifies superseded background messages, `None` to disable"""
+        self.weights = {InboundScheduler.CONTROL: 8, InboundScheduler.REPLY: 4, InboundScheduler.INTENT: 2, InboundScheduler.BACKGROUND: 1, **weights}
+        self.limits = {InboundScheduler.CONTROL: 1000, InboundScheduler.REPLY: 1000, InboundScheduler.INTENT: 100, InboundScheduler.BACKGROUND: 100, **limits}
+        for c in InboundScheduler.CLASSES:
+            assert self.weights[c] > 0, f"weight of {c} has to be greater than 0"
+            assert self.limits[c] > 0, f"limit of {c} has to be greater than 0"
+        self.coalesce_key = coalesce_key
+        self.dropped = {c: 0 for c in InboundScheduler.CLASSES}
+        self.coalesced = 0
+        self._queues = {c: deque() for c in InboundScheduler.CLASSES}
+        self._credits = dict(self.weights)
+        self._pending = {}  # coalesce key -> queued entry
+        self._cond = threading.Condition()
+        self._handler = None
+        self._thread = None
+        self._running = False
+
+    def start(self, handler):
+        """Start dispatching queued messages to `handler` in a background thread"""
+        with self._cond:
+            self._handler = handler
+            if self._running:
+                return
+            self._running = True
+            # a thread of a previous start exits once it sees it was replaced
+            self._thread = threading.Thread(target=self._loop, name="jarvis-inbound")
+            self._thread.daemon = True
+            thread = self._thread
+            self._cond.notify_all()
+        thread.start()
+
+    def stop(self):
+        """Stop the dispatching thread, queued messages are kept"""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+
+    def put(self, priority_class: str, message):
+        """Queue a message for the given priority class"""
+        key = None
+        if priority_class == InboundScheduler.BACKGROUND and self.coalesce_key is not None and isinstance(message, dict):
+            key = message.get(self.coalesce_key, None)
+        with self._cond:
+            if key is not None and key in self._pending:
+                self._pending[key][1] = message
+                self.coalesced += 1
+                Metrics.inc("connection_messages_coalesced_total")
+                return
+            queue = self._queues[priority_class]
+            if len(queue) >= self.limits[priority_class]:
+                dropped = queue.popleft()
+                if dropped[2] is not None:
+                    self._pending.pop(dropped[2], None)
+                self.dropped[priority_class] += 1
+                Metrics.inc("connection_messages_dropped_total", priority=priority_class)
+            entry = [time.perf_counter(), message, key]
+            queue.append(entry)
+            if key is not None:
+                self._pending[key] = entry
+            Metrics.set("connection_queue_depth", len(queue), priority=priority_class)
+            self._cond.notify()
+
+    def depth(self) -> dict:
+        """Get the number of queued messages per class"""
+        with self._cond:
+            return {c: len(q) for c, q in self._queues.items()}
+
+    def _next(self):
+        """Take the next entry by weighted round robin, must be called with the lock held"""
+        for _ in range(2):
+            for c in InboundScheduler.CLASSES:
+                if self._credits[c] > 0 and len(self._queues[c]) > 0:
+                    self._credits[c] -= 1
+                    return c, self._queues[c].popleft()
+            # every class with queued messages used up its credits: start a new round
+            self._credits = dict(self.weights)
+        return None, None
+
+    def _loop(self):
+        current = threading.current_thread()
+        while True:
+            with self._cond:
+                while self._running and self._thread is current and not any(self._queues.values()):
+                    self._cond.wait()
+                if not self._running or self._thread is not current:
+                    return
+                priority_class, entry = self._next()
+                if entry[2] is not None:
+                    self._pending.pop(entry[2], None)
+                handler = self._handler
+                Metrics.set("connection_queue_depth", len(self._queues[priority_class]), priority=priority_class)
+            Metrics.observe("connection_queue_seconds", time.perf_counter() - entry[0], priority=priority_class)
+            try:
+                handler(entry[1])
+            except Exception:
+                traceback.print_exc()
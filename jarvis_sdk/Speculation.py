@@ -0,0 +1,153 @@
+"""
+Copyright (c) 2021 Philipp Scheer
+"""
+
+
+import copy
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from .Metrics import Metrics
+
+
+class Speculation():
+    """Internal registry which warms up handlers from partial NLU hypotheses while the user is still speaking.
+    You should not call this class, use `Intent.prefetch` and `Intent.speculate` instead"""
+
+    max_workers = 4
+
+    _hooks = {}
+    _active = {}
+    _stats = {"started": 0, "hits": 0, "misses": 0, "cancelled": 0}
+    _executor = None
+    _lock = threading.RLock()
+
+    @staticmethod
+    def register(skill: str, intent: str, hook):
+        Speculation._hooks.setdefault((skill, intent), []).append(hook)
+
+    @staticmethod
+    def start(captured_intent_data, stream: str = "default"):
+        """Start a speculation for a partial hypothesis, an equal running speculation is kept,
+        a stale one for the same stream gets cancelled"""
+        signature = _signature(captured_intent_data)
+        with Speculation._lock:
+            current = Speculation._active.get(stream, None)
+            if current is not None and current.signature == signature:
+                return current
+            if current is not None:
+                current.cancel()
+                Speculation._count("cancelled")
+            speculative = _Speculative(captured_intent_data, signature)
+            Speculation._active[stream] = speculative
+            Speculation._count("started")
+            if Speculation._executor is None:
+                Speculation._executor = ThreadPoolExecutor(max_workers=Speculation.max_workers, thread_name_prefix="jarvis-speculation")
+            executor = Speculation._executor
+            speculative.resolving = executor.submit(_resolve_slots, speculative)
+            for (skill, intent), hooks in list(Speculation._hooks.items()):
+                if skill in (captured_intent_data.skill, "*") and intent in (captured_intent_data.intent, "*"):
+                    for hook in hooks:
+                        speculative.futures[hook.__name__] = executor.submit(_run_hook, speculative, hook)
+        return speculative
+
+    @staticmethod
+    def commit(captured_intent_data, stream: str = "default") -> bool:
+        """Match the final result against the running speculation of `stream`.
+        On a hit the prefetched results and resolved slots are attached to `captured_intent_data`"""
+        with Speculation._lock:
+            speculative = Speculation._active.pop(stream, None)
+        if speculative is None:
+            return False
+        if speculative.signature != _signature(captured_intent_data):
+            speculative.cancel()
+            Speculation._count("misses")
+            return False
+        Speculation._count("hits")
+        captured_intent_data._prefetched = speculative.futures
+        if speculative.resolving is not None and speculative.resolving.done() and speculative.resolving.exception() is None:
+            resolved = speculative.resolving.result()
+            slots = [_with_resolved(slot, resolved) for slot in captured_intent_data.slots]
+            # the slots may belong to the caller's nlu result, so they are copied instead of modified
+            captured_intent_data.data = {**captured_intent_data.data, "slots": slots}
+            captured_intent_data._slots = None
+        return True
+
+    @staticmethod
+    def discard(stream: str = "default"):
+        """Cancel the running speculation of `stream`, if any"""
+        with Speculation._lock:
+            speculative = Speculation._active.pop(stream, None)
+        if speculative is not None:
+            speculative.cancel()
+            Speculation._count("cancelled")
+
+    @staticmethod
+    def stats() -> dict:
+        with Speculation._lock:
+            stats = dict(Speculation._stats)
+        finished = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / finished if finished > 0 else None
+        return stats
+
+    @staticmethod
+    def _count(key: str):
+        with Speculation._lock:
+            Speculation._stats[key] += 1
+        Metrics.inc("intent_speculations_total", outcome=key)
+
+
+class _Speculative():
+    def __init__(self, captured_intent_data, signature: tuple) -> None:
+        self.data = captured_intent_data
+        self.signature = signature
+        self.cancelled = threading.Event()
+        self.resolving = None
+        self.futures = {}
+
+    def cancel(self):
+        self.cancelled.set()
+        if self.resolving is not None:
+            self.resolving.cancel()
+        for future in self.futures.values():
+            future.cancel()
+
+
+def _signature(captured_intent_data) -> tuple:
+    """Two hypotheses are equal if skill, intent and all slot names and raw values match"""
+    slots = tuple(sorted((slot.get("slotName", ""), slot.get("rawValue", "")) for slot in captured_intent_data.slots))
+    return (captured_intent_data.skill, captured_intent_data.intent, slots)
+
+
+def _with_resolved(slot, resolved: dict):
+    """Get a copy of `slot` with its speculatively resolved value, or `slot` itself if there is nothing to add"""
+    name = slot.get("slotName", None)
+    if resolved.get(name, None) is None or slot.get("resolved", None) is not None:
+        return slot
+    if isinstance(slot, dict):
+        return {**slot, "resolved": resolved[name]}
+    slot = copy.copy(slot)
+    slot.resolved = resolved[name]
+    return slot
+
+
+def _resolve_slots(speculative: _Speculative) -> dict:
+    resolved = {}
+    container = speculative.data.slots
+    for slot in container:
+        if speculative.cancelled.is_set():
+            break
+        name = slot.get("slotName", None)
+        if name is not None:
+            resolved[name] = getattr(container, name)
+    return resolved
+
+
+def _run_hook(speculative: _Speculative, hook):
+    if speculative.cancelled.is_set():
+        return None
+    try:
+        return hook(speculative.data)
+    except Exception:
+        traceback.print_exc()
+        raise
@@ -6,6 +6,7 @@ Copyright (c) 2021 Philipp Scheer
 import os
 import time
 import json
+from .Metrics import Metrics
 
 
 class Storage:
@@ -15,16 +16,18 @@ class Storage:
 
     @staticmethod
     def get(key: str, default: any = None):
-        Storage.check_file()
-        val = json.load(open(Storage.PATH + "/" + Storage.FILENAME, "r+"))
-        return val.get(key, default)
+        with Metrics.timer("storage_seconds", operation="get"):
+            Storage.check_file()
+            val = json.load(open(Storage.PATH + "/" + Storage.FILENAME, "r+"))
+            return val.get(key, default)
 
     @staticmethod
     def set(key: str, value: any):
-        Storage.check_file()
-        val = json.load(open(Storage.PATH + "/" + Storage.FILENAME, "r+"))
-        val[key] = value
-        json.dump(val, open(Storage.PATH + "/" + Storage.FILENAME, "w+"))
+        with Metrics.timer("storage_seconds", operation="set"):
+            Storage.check_file()
+            val = json.load(open(Storage.PATH + "/" + Storage.FILENAME, "r+"))
+            val[key] = value
+            json.dump(val, open(Storage.PATH + "/" + Storage.FILENAME, "w+"))
 
     @staticmethod
     def check_file():
@@ -0,0 +1,220 @@
+"""
+Copyright (c) 2021 Philipp Scheer
+"""
+
+
+import time
+import threading
+import traceback
+from .Metrics import Metrics
+
+
+class Telemetry():
+    """Continuously report device state over a `Connection`, sending only what changed.
+    Every probe is a function returning a json value or one of the `jarvis_sdk.struct.Controls` dataclasses.
+    Expensive probes can be cached with `ttl`, and `min_interval` limits how often a field may be sent.
+    Each report only contains the fields which differ from the last snapshot the server acknowledged:
+    ```json
+    {
+        "seq": 12,              // sequence number of this report
+        "base": 11,             // sequence number of the snapshot this delta applies to, null for a full snapshot
+        "set": {"audio.default_input": 2, "uptime.timestamp": 1617184812.12},
+        "unset": ["plugins"]
+    }
+    ```
+    The server acknowledges a report by replying to it, a reply containing `"resync": true` forces a full snapshot.
+    Usage:
+    ```python
+    from jarvis_sdk import Connection, Telemetry
+    from jarvis_sdk.struct.Controls import Uptime
+
+    started = time.time()
+    con = Connection("my-device-id")
+    telemetry = Telemetry(con, interval=10)
+    telemetry.probe("uptime", lambda: Uptime(started), min_interval=60)
+    telemetry.probe("audio", enumerate_audio_devices, ttl=300)
+    telemetry.start()
+    ```"""
+
+    def __init__(self, connection, endpoint: str = "telemetry/report", interval: float = 10) -> None:
+        self.connection = connection
+        self.endpoint = endpoint
+        self.interval = interval
+        self._probes = {}
+        self._acked = None      # (seq, flat snapshot) the server confirmed
+        self._pending = {}      # seq -> flat snapshot sent but not acknowledged yet
+        self._reqids = {}       # seq -> request id of a pending report, to drop its reply callback
+        self._last_sent = {}    # field -> time it was last included in a report
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def probe(self, name: str, function, ttl: float = None, min_interval: float = None):
+        """Register a probe under `name`.
+        `ttl`: cache the probed value for this many seconds instead of probing on every tick
+        `min_interval`: send changes of this probe's fields at most once per this many seconds"""
+        assert callable(function), "function has to be callable"
+        self._probes[name] = _Probe(function, ttl, min_interval)
+
+    def sample(self) -> dict:
+        """Run all probes (or use their cached values) and return a flat snapshot"""
+        snapshot = {}
+        now = time.time()
+        for name, probe in list(self._probes.items()):
+            try:
+                value = probe.value(now)
+            except Exception:
+                traceback.print_exc()
+                continue
+            _flatten(name, value, snapshot)
+        return snapshot
+
+    def delta(self, snapshot: dict, now: float = None) -> tuple:
+        """Compute the fields to set and unset compared to the last acknowledged snapshot,
+        respecting the per field rate limits. Returns `(base_seq, set_dict, unset_list)`"""
+        with self._lock:
+            acked = self._acked
+        return self._delta(snapshot, time.time() if now is None else now, acked)
+
+    def _delta(self, snapshot: dict, now: float, acked: tuple) -> tuple:
+        base_seq, base = acked if acked is not None else (None, {})
+        changed = {}
+        for key, value in snapshot.items():
+            if key in base and base[key] == value:
+                continue
+            if not self._may_send(key, now):
+                continue
+            changed[key] = value
+        removed = [key for key in base if key not in snapshot and self._may_send(key, now)]
+        return (base_seq, changed, removed)
+
+    def tick(self):
+        """Sample all probes and send a report if anything changed since the last acknowledged snapshot"""
+        snapshot = self.sample()
+        now = time.time()
+        # the delta and the snapshot the server knows afterwards have to use the same base,
+        # even if an acknowledgement arrives in between
+        with self._lock:
+            acked = self._acked
+        base_seq, changed, removed = self._delta(snapshot, now, acked)
+        if len(changed) == 0 and len(removed) == 0:
+            return None
+        _, base = acked if acked is not None else (None, {})
+        with self._lock:
+            self._seq += 1
+            seq = self._seq
+            # what the server will know once it acknowledged this report
+            known = {k: v for k, v in base.items() if k not in removed}
+            known.update(changed)
+            self._pending[seq] = known
+        sent = self.connection.request(self.endpoint, {
+            "seq": seq,
+            "base": base_seq,
+            "set": changed,
+            "unset": removed
+        }, lambda reply: self._on_ack(seq, reply))
+        if sent is None:
+            with self._lock:
+                self._pending.pop(seq, None)
+            return None
+        with self._lock:
+            pending = seq in self._pending
+            if pending:
+                self._reqids[seq] = sent
+        if not pending:
+            # acknowledged or superseded before `request` returned
+            self._forget(sent)
+        for key in list(changed) + removed:
+            self._last_sent[key] = now
+        Metrics.inc("telemetry_reports_total", kind="full" if base_seq is None else "delta")
+        Metrics.inc("telemetry_fields_sent_total", len(changed) + len(removed))
+        return seq
+
+    def resync(self):
+        """Forget the acknowledged snapshot, the next report contains all fields"""
+        with self._lock:
+            self._acked = None
+            self._pending = {}
+            reqids, self._reqids = self._reqids, {}
+        self._last_sent = {}
+        for reqid in reqids.values():
+            self._forget(reqid)
+
+    def start(self):
+        """Start reporting every `interval` seconds in a background thread"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="jarvis-telemetry")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background thread"""
+        self._stop.set()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.tick()
+            except Exception:
+                traceback.print_exc()
+            self._stop.wait(self.interval)
+
+    def _on_ack(self, seq: int, reply: dict):
+        if isinstance(reply, dict):
+            self._forget(reply.get("$reqid", None))
+        if isinstance(reply, dict) and reply.get("resync", False):
+            self.resync()
+            return
+        superseded = []
+        with self._lock:
+            self._reqids.pop(seq, None)
+            known = self._pending.pop(seq, None)
+            if known is None or (self._acked is not None and self._acked[0] > seq):
+                return
+            self._acked = (seq, known)
+            # older reports are superseded by this acknowledgement
+            for s in [s for s in self._pending if s < seq]:
+                del self._pending[s]
+                superseded.append(self._reqids.pop(s, None))
+        for reqid in superseded:
+            self._forget(reqid)
+
+    def _forget(self, reqid: str):
+        """Drop the reply callback of a report from the connection"""
+        if reqid is not None:
+            self.connection.forget(reqid)
+
+    def _may_send(self, key: str, now: float) -> bool:
+        probe = self._probes.get(key.split(".", 1)[0], None)
+        if probe is None or probe.min_interval is None:
+            return True
+        return now - self._last_sent.get(key, 0) >= probe.min_interval
+
+
+class _Probe():
+    def __init__(self, function, ttl: float = None, min_interval: float = None) -> None:
+        self.function = function
+        self.ttl = ttl
+        self.min_interval = min_interval
+        self._value = None
+        self._sampled_at = None
+
+    def value(self, now: float):
+        if self.ttl is None or self._sampled_at is None or now - self._sampled_at >= self.ttl:
+            value = self.function()
+            self._value = value.json() if hasattr(value, "json") else value
+            self._sampled_at = now
+        return self._value
+
+
+def _flatten(prefix: str, value, into: dict):
+    """Flatten nested dicts into dotted keys, lists and scalars are kept as leaf values"""
+    if isinstance(value, dict) and len(value) > 0:
+        for k, v in value.items():
+            _flatten(f"{prefix}.{k}", v, into)
+    else:
+        into[prefix] = value
+    return into
@@ -10,22 +10,79 @@
     * [IntentCardResponse](jarvis_sdk/Intent.html#IntentCardResponse)
     * [CapturedIntentData](jarvis_sdk/Intent.html#CapturedIntentData)
     * [IntentSlotsContainer](jarvis_sdk/Intent.html#IntentSlotsContainer)
+    * [IntentSlot](jarvis_sdk/Intent.html#IntentSlot)
 * [Entity](jarvis_sdk/Entity.html)
     * [IEntity](jarvis_sdk/Entity.html#IEntity)
+* [Gazetteer](jarvis_sdk/Gazetteer.html)
+    * [GazetteerEntity](jarvis_sdk/Gazetteer.html#GazetteerEntity)
 * [TestSuite](jarvis_sdk/TestSuite.html)
 * [Storage](jarvis_sdk/Storage.html)
     * [Session](jarvis_sdk/Storage.html#Session)
 * [Api](jarvis_sdk/Api.html)
 * [Connection](jarvis_sdk/Connection.html)
+    * [WebSocketTransport](jarvis_sdk/Connection.html#WebSocketTransport)
+* [Multiplex](jarvis_sdk/Multiplex.html)
+    * [MultiplexClient](jarvis_sdk/Multiplex.html#MultiplexClient)
+    * [VirtualDevice](jarvis_sdk/Multiplex.html#VirtualDevice)
+    * [LoadGenerator](jarvis_sdk/Multiplex.html#LoadGenerator)
+* [Mock](jarvis_sdk/Mock.html)
+    * [MockServer](jarvis_sdk/Mock.html#MockServer)
+* [Breaker](jarvis_sdk/Breaker.html)
+    * [CircuitBreaker](jarvis_sdk/Breaker.html#CircuitBreaker)
+* [Loader](jarvis_sdk/Loader.html)
+* [Reloader](jarvis_sdk/Reloader.html)
+* [Render](jarvis_sdk/Render.html)
+    * [RenderCache](jarvis_sdk/Render.html#RenderCache)
+    * [IRenderer](jarvis_sdk/Render.html#IRenderer)
+    * [StubRenderer](jarvis_sdk/Render.html#StubRenderer)
+* [Scheduler](jarvis_sdk/Scheduler.html)
+    * [InboundScheduler](jarvis_sdk/Scheduler.html#InboundScheduler)
+* [Telemetry](jarvis_sdk/Telemetry.html)
+* [Memo](jarvis_sdk/Memo.html)
+    * [ResponseCache](jarvis_sdk/Memo.html#ResponseCache)
+* [Metrics](jarvis_sdk/Metrics.html)
+    * [IMetricsSink](jarvis_sdk/Metrics.html#IMetricsSink)
+    * [PrometheusFileSink](jarvis_sdk/Metrics.html#PrometheusFileSink)
+    * [CallbackSink](jarvis_sdk/Metrics.html#CallbackSink)
 """
 
 
-from .Intent import Intent, IntentResponse, ResolvedIntentResponse, IIntentResponse, IntentTextResponse, IntentSpeechResponse, IntentCardResponse, CapturedIntentData, IntentSlotsContainer
+from .Intent import Intent, IntentResponse, ResolvedIntentResponse, IIntentResponse, IntentTextResponse, IntentSpeechResponse, IntentCardResponse, CapturedIntentData, IntentSlotsContainer, IntentSlot, IntentDataError
 from .Entity import Entity, IEntity
+from .Breaker import CircuitBreaker, HandlerTimeoutError
 from .TestSuite import TestSuite
 from .Storage import Storage, Session
-from .Api import Api
-from .Connection import Connection
+from .Metrics import Metrics, IMetricsSink, PrometheusFileSink, CallbackSink
+from .Loader import Loader
+from .Telemetry import Telemetry
+from .Memo import ResponseCache
+from .Scheduler import InboundScheduler
+from .Reloader import Reloader
+from .Render import RenderCache, IRenderer, StubRenderer
+
+import importlib
+
+# Connection (websocket), Api (requests) and the multiplexing client (asyncio) are only
+# imported on first access, so processes which only parse intents don't pay for them at startup
+_lazy_modules = {
+    "Api": ".Api",
+    "ApiErrorResponse": ".Api",
+    "Connection": ".Connection",
+    "WebSocketTransport": ".Connection",
+    "Gazetteer": ".Gazetteer",
+    "GazetteerEntity": ".Gazetteer",
+    "MockServer": ".Mock",
+    "MultiplexClient": ".Multiplex",
+    "VirtualDevice": ".Multiplex",
+    "LoadGenerator": ".Multiplex",
+}
+
+def __getattr__(name: str):
+    if name in _lazy_modules:
+        value = getattr(importlib.import_module(_lazy_modules[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # TODO: add more sessions
 session = Session()
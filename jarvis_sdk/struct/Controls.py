@@ -4,7 +4,7 @@ Copyright (c) 2021 Philipp Scheer
 
 
 import time
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 
 @dataclass
@@ -13,6 +13,17 @@ class AudioDevice:
     index: int
     name: str
 
+    def json(self):
+        return {
+            "type": self.type,
+            "index": self.index,
+            "name": self.name
+        }
+
+    @classmethod
+    def object(cls, json: dict):
+        return cls(**json)
+
 @dataclass
 class AudioInformation:
     available_inputs: list # of AudioDevice
@@ -20,6 +31,22 @@ class AudioInformation:
     available_outputs: list # of AudioDevice
     default_output: int
 
+    def json(self):
+        return {
+            "available_inputs": [d.json() if isinstance(d, AudioDevice) else d for d in self.available_inputs],
+            "default_input": self.default_input,
+            "available_outputs": [d.json() if isinstance(d, AudioDevice) else d for d in self.available_outputs],
+            "default_output": self.default_output
+        }
+
+    @classmethod
+    def object(cls, json: dict):
+        return cls(**{
+            **json,
+            "available_inputs": [AudioDevice.object(d) if isinstance(d, dict) else d for d in json.get("available_inputs", [])],
+            "available_outputs": [AudioDevice.object(d) if isinstance(d, dict) else d for d in json.get("available_outputs", [])]
+        })
+
 
 @dataclass
 class VideoInformation:
@@ -38,7 +65,7 @@ class Raw:
 @dataclass
 class Uptime:
     alive_since: float
-    timestamp: float = time.time()
+    timestamp: float = field(default_factory=time.time)
 
     def json(self):
         return {
@@ -47,8 +74,8 @@ class Uptime:
         }
 
     @classmethod
-    def object(json: dict):
-        return Uptime(**json)
+    def object(cls, json: dict):
+        return cls(**json)
 
 
 @dataclass
@@ -76,5 +103,6 @@ class SystemInformation:
         }
 
     @classmethod
-    def object(json: dict):
-        return SystemInformation(**json)
+    def object(cls, json: dict):
+        audio = json.get("audio", None)
+        return cls(**{**json, "audio": AudioInformation.object(audio) if isinstance(audio, dict) else audio})
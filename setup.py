@@ -26,7 +26,7 @@ setuptools.setup(
         "Operating System :: POSIX :: Linux",
         "Operating System :: MacOS",
     ],
-    python_requires='>=3.6',
+    python_requires='>=3.7',
 )
 
 
@@ -0,0 +1,24 @@
+"""
+Copyright (c) 2021 Philipp Scheer
+"""
+
+
+from jarvis_sdk import IntentResponse, Metrics
+from jarvis_sdk.Breaker import HandlerGuard
+
+
+def test_fallback_reports_the_error(capsys):
+    fallback = IntentResponse.single_text("Sorry")
+    def broken(captured_data):
+        raise ValueError("boom")
+    guard = HandlerGuard(broken, "Units$convert$broken", fallback=fallback)
+    Metrics.reset()
+    Metrics.enable()
+    try:
+        assert guard(None) is fallback
+        errors = [s for s in Metrics.collect() if s["name"] == "intent_handler_errors_total"]
+    finally:
+        Metrics.disable()
+        Metrics.reset()
+    assert [s["value"] for s in errors] == [1]
+    assert "ValueError: boom" in capsys.readouterr().err
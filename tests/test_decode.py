@@ -0,0 +1,44 @@
+"""
+Copyright (c) 2021 Philipp Scheer
+"""
+
+
+import json
+import pytest
+from jarvis_sdk import CapturedIntentData, IntentDataError
+
+
+def _result(value: dict) -> dict:
+    return {
+        "input": "set a timer for 5 minutes",
+        "skill": "Timer",
+        "intent": "setTimer",
+        "probability": 0.97,
+        "slots": [{
+            "range": {"start": 16, "end": 25},
+            "rawValue": "5 minutes",
+            "value": value,
+            "entity": "snips/duration",
+            "slotName": "duration"
+        }]
+    }
+
+
+def test_decode_accepts_values_without_value_key():
+    duration = {"kind": "Duration", "years": 0, "quarters": 0, "months": 0, "weeks": 0, "days": 0,
+                "hours": 0, "minutes": 5, "seconds": 0, "precision": "Exact"}
+    interval = {"kind": "TimeInterval", "from": "2021-04-01 10:00:00 +00:00", "to": "2021-04-01 12:00:00 +00:00"}
+    for value in (duration, interval):
+        data = CapturedIntentData.decode(json.dumps(_result(value)).encode("utf-8"))
+        assert data.slots._slots[0].value == value
+
+
+def test_decode_rejects_values_without_kind():
+    with pytest.raises(IntentDataError):
+        CapturedIntentData.decode(_result({"value": "5 minutes"}))
+
+
+def test_decode_does_not_modify_its_input():
+    result = _result({"kind": "Custom", "value": "5 minutes"})
+    CapturedIntentData.decode(result)
+    json.dumps(result)
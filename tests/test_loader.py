@@ -0,0 +1,27 @@
+"""
+Copyright (c) 2021 Philipp Scheer
+"""
+
+
+from jarvis_sdk import Intent, IntentResponse
+
+
+NLU_RESULT = {"input": "convert 5 meters", "skill": "Units", "intent": "convert", "probability": 0.98, "slots": []}
+
+
+def test_broken_lazy_handler_does_not_break_others(capsys):
+    handlers, lazy = Intent._handlers, Intent._lazy
+    try:
+        Intent._handlers, Intent._lazy = {}, []
+
+        @Intent.on("Units", "convert")
+        def convert(captured_data):
+            return IntentResponse.single_text("5 meters are 16.4 feet")
+
+        Intent.lazy("*", "*", "nonexistent_jarvis_skill:handler")
+        success, response = Intent._emit("Units", "convert", NLU_RESULT)
+        assert success and response.text.responses == ["5 meters are 16.4 feet"]
+        assert Intent._lazy == []
+        assert "nonexistent_jarvis_skill" in capsys.readouterr().err
+    finally:
+        Intent._handlers, Intent._lazy = handlers, lazy
@@ -0,0 +1,55 @@
+"""
+Copyright (c) 2021 Philipp Scheer
+"""
+
+
+from jarvis_sdk import Intent, IntentResponse, CapturedIntentData, ResponseCache
+
+
+NLU_RESULT = {
+    "input": "convert 5 meters to feet",
+    "skill": "Units",
+    "intent": "convert",
+    "probability": 0.98,
+    "slots": [
+        {
+            "range": {"start": 8, "end": 9},
+            "rawValue": "5",
+            "value": {"kind": "Custom", "value": "5"},
+            "entity": "number",
+            "slotName": "amount"
+        }
+    ]
+}
+
+
+def test_key_depends_on_handler_name():
+    data = CapturedIntentData(NLU_RESULT)
+    assert ResponseCache.key(data, "a") != ResponseCache.key(data, "b")
+    assert ResponseCache.key(data, "a") == ResponseCache.key(CapturedIntentData(NLU_RESULT), "a")
+
+
+def test_cache_shared_by_two_handlers():
+    handlers = Intent._handlers
+    try:
+        Intent._handlers = {}
+        cache = ResponseCache()
+        calls = []
+
+        @Intent.on("Units", "*", cache=cache)
+        def a(captured_data):
+            calls.append("a")
+            return IntentResponse.single_text("A")
+
+        @Intent.on("Units", "*", cache=cache)
+        def b(captured_data):
+            calls.append("b")
+            return IntentResponse.single_text("B")
+
+        for _ in range(2):
+            data = CapturedIntentData(NLU_RESULT)
+            assert [h(data).text.responses for h in Intent._get("Units", "convert")] == [["A"], ["B"]]
+        assert sorted(calls) == ["a", "b"]
+        assert len(cache) == 2
+    finally:
+        Intent._handlers = handlers
@@ -0,0 +1,25 @@
+"""
+Copyright (c) 2021 Philipp Scheer
+"""
+
+
+from jarvis_sdk import Metrics
+
+
+def test_prometheus_groups_samples_by_metric():
+    Metrics.reset()
+    Metrics.enable()
+    try:
+        Metrics.inc("api_calls_total", endpoint="a")
+        Metrics.inc("api_errors_total", endpoint="a")
+        Metrics.inc("api_calls_total", endpoint="b")
+        Metrics.set("api_calls_in_flight", 1)
+        text = Metrics.prometheus()
+    finally:
+        Metrics.disable()
+        Metrics.reset()
+    names = [line.split("{")[0].split(" ")[0] for line in text.splitlines() if not line.startswith("#")]
+    # every metric forms one contiguous block
+    blocks = [name for i, name in enumerate(names) if i == 0 or names[i - 1] != name]
+    assert sorted(blocks) == sorted(set(names))
+    assert text.count("# TYPE api_calls_total counter") == 1
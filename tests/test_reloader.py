@@ -0,0 +1,113 @@
+"""
+Copyright (c) 2021 Philipp Scheer
+"""
+
+
+import sys
+import time
+import threading
+import pytest
+from jarvis_sdk import Intent, Entity, Reloader, CircuitBreaker, ResponseCache
+
+
+NLU_RESULT = {"input": "convert 5 meters", "skill": "Units", "intent": "convert", "probability": 0.98, "slots": []}
+
+
+@pytest.fixture
+def skill_dir(tmp_path, monkeypatch):
+    """An empty skill directory on `sys.path`, all intent and entity registries are restored afterwards"""
+    monkeypatch.setattr(sys, "dont_write_bytecode", True)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    saved = (Intent._handlers, Intent._guards, Intent._caches, Intent._lazy, Intent._loaded, Entity._entities, Entity._lazy, Entity._loaded)
+    Intent._handlers, Intent._guards, Intent._caches, Intent._lazy, Intent._loaded = {}, {}, [], [], []
+    Entity._entities, Entity._lazy, Entity._loaded = {}, {}, {}
+    yield tmp_path
+    (Intent._handlers, Intent._guards, Intent._caches, Intent._lazy, Intent._loaded, Entity._entities, Entity._lazy, Entity._loaded) = saved
+    for name in [m for m in sys.modules if m.startswith("reload_skill_")]:
+        del sys.modules[name]
+
+
+def test_reload_keeps_lazily_loaded_handlers(skill_dir):
+    source = """
+from jarvis_sdk import IntentResponse, IEntity
+
+def convert(captured_data):
+    return IntentResponse.single_text("VERSION")
+
+class unit(IEntity):
+    def resolve(self):
+        return "VERSION"
+"""
+    (skill_dir / "reload_skill_units.py").write_text(source.replace("VERSION", "v1"))
+    Intent.load_manifest({
+        "intents": [{"skill": "Units", "intent": "convert", "handler": "reload_skill_units:convert", "timeout": 1}],
+        "entities": {"unit": "reload_skill_units:unit"}
+    })
+    assert Intent._emit("Units", "convert", NLU_RESULT)[1].text.responses == ["v1"]
+    assert Entity.get("unit")().resolve() == "v1"
+
+    (skill_dir / "reload_skill_units.py").write_text(source.replace("VERSION", "v2"))
+    Reloader.reload("reload_skill_units")
+    assert Intent._emit("Units", "convert", NLU_RESULT)[1].text.responses == ["v2"]
+    assert Entity.get("unit")().resolve() == "v2"
+    assert len(Intent._handlers) == 1 and list(Intent._guards) == ["Units$convert$convert"]
+
+
+def test_failed_reload_keeps_guards_caches_and_globals(skill_dir):
+    source = """
+from jarvis_sdk import Intent, IntentResponse, CircuitBreaker, ResponseCache
+
+ANSWER = "v1"
+
+@Intent.on("Units", "convert", breaker=CircuitBreaker(), cache=ResponseCache())
+def convert(captured_data):
+    return IntentResponse.single_text(ANSWER)
+"""
+    (skill_dir / "reload_skill_broken.py").write_text(source)
+    import reload_skill_broken
+    guard = Intent._guards["Units$convert$convert"]
+    guard.breaker._state = CircuitBreaker.OPEN
+    guard.breaker._opened_at = time.time()
+    breakers, caches = Intent.breakers(), list(Intent._caches)
+
+    (skill_dir / "reload_skill_broken.py").write_text(source.replace('"v1"', '"v2"') + "\nraise RuntimeError('broken')\n")
+    with pytest.raises(RuntimeError):
+        Reloader.reload("reload_skill_broken")
+    assert Intent.breakers() == breakers
+    assert Intent._guards["Units$convert$convert"] is guard
+    assert Intent._caches == caches
+    assert reload_skill_broken.ANSWER == "v1"
+
+
+def test_reload_does_not_block_utterances(skill_dir):
+    (skill_dir / "reload_skill_gate.py").write_text("import threading\nGATE = threading.Event()\n")
+    (skill_dir / "reload_skill_slow.py").write_text("""
+from jarvis_sdk import Intent, IntentResponse
+from reload_skill_gate import GATE
+
+if globals().get("LOADED", False):
+    GATE.wait(5)
+LOADED = True
+
+@Intent.on("Slow", "wait")
+def wait(captured_data):
+    return IntentResponse.single_text("slow")
+""")
+    from reload_skill_gate import GATE
+    import reload_skill_slow
+
+    @Intent.on("Units", "convert")
+    def convert(captured_data):
+        return None
+
+    Intent.lazy("Other", "skill", "reload_skill_other:handler")
+    reloading = threading.Thread(target=Reloader.reload, args=("reload_skill_slow",))
+    reloading.start()
+    try:
+        time.sleep(0.1)
+        start = time.perf_counter()
+        assert Intent._emit("Units", "convert", NLU_RESULT)[0]
+        assert time.perf_counter() - start < 1
+    finally:
+        GATE.set()
+        reloading.join()
@@ -0,0 +1,51 @@
+"""
+Copyright (c) 2021 Philipp Scheer
+"""
+
+
+from jarvis_sdk import Intent, Entity, IEntity, IntentResponse
+from jarvis_sdk.Speculation import Speculation
+
+
+class spec_city(IEntity):
+    def resolve(self):
+        return "NYC"
+
+
+def _result() -> dict:
+    return {
+        "input": "weather in new york",
+        "skill": "Weather",
+        "intent": "getWeather",
+        "probability": 0.95,
+        "slots": [{
+            "range": {"start": 11, "end": 19},
+            "rawValue": "new york",
+            "value": {"kind": "Custom", "value": "new york"},
+            "entity": "spec_city",
+            "slotName": "city"
+        }]
+    }
+
+
+def test_commit_does_not_modify_the_final_result():
+    handlers, entities = Intent._handlers, Entity._entities
+    try:
+        Intent._handlers = {}
+        Entity.register(spec_city)
+        seen = []
+
+        @Intent.on("Weather", "getWeather")
+        def getWeather(captured_data):
+            seen.append(captured_data.slots._slots[0].get("resolved", None))
+            return IntentResponse.single_text(captured_data.slots.city)
+
+        assert Intent.speculate(_result(), stream="spec-test")
+        Speculation._active["spec-test"].resolving.result(5)
+        final = _result()
+        success, response = Intent._emit("Weather", "getWeather", final, stream="spec-test")
+        assert success and response.text.responses == ["NYC"]
+        assert seen == ["NYC"]
+        assert final == _result()
+    finally:
+        Intent._handlers, Entity._entities = handlers, entities
@@ -0,0 +1,56 @@
+"""
+Copyright (c) 2021 Philipp Scheer
+"""
+
+
+from jarvis_sdk import Telemetry
+
+
+class FakeConnection():
+    """Applies reports like the server would and acknowledges them when told to"""
+
+    def __init__(self) -> None:
+        self.callbacks = {}
+        self.states = {None: {}}
+        self.unacked = []
+
+    def request(self, endpoint, payload, callback = None):
+        reqid = str(len(self.states))
+        state = {k: v for k, v in self.states[payload["base"]].items() if k not in payload["unset"]}
+        state.update(payload["set"])
+        self.states[payload["seq"]] = state
+        self.callbacks[reqid] = callback
+        self.unacked.append(reqid)
+        return reqid
+
+    def forget(self, reqid):
+        self.callbacks.pop(reqid, None)
+
+    def ack(self):
+        while self.unacked:
+            reqid = self.unacked.pop(0)
+            if reqid in self.callbacks:
+                self.callbacks[reqid]({"$reqid": reqid})
+
+
+class RacyTelemetry(Telemetry):
+    """Delivers pending acknowledgements while a report is being built"""
+
+    def _delta(self, snapshot, now, acked):
+        self.connection.ack()
+        return super()._delta(snapshot, now, acked)
+
+
+def test_acknowledged_snapshot_matches_the_server():
+    connection = FakeConnection()
+    telemetry = RacyTelemetry(connection)
+    values = {"a": 0, "b": 0}
+    telemetry.probe("a", lambda: values["a"])
+    telemetry.probe("b", lambda: values["b"])
+    for i in range(1, 20):
+        values["a" if i % 2 else "b"] = i
+        telemetry.tick()
+    connection.ack()
+    seq, known = telemetry._acked
+    assert known == connection.states[seq]
+    assert connection.callbacks == {}